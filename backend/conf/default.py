@@ -40,7 +40,37 @@ class Data:
 
 
 @dataclass
-class Conf(Base, Data):
+class Pipeline:
+    # The number of the threads loading the found files
+    load_workers: int = 2
+    # The size of the bounded queues between the finding and loading
+    queue_size: int = 4
+    # The number of the processes rendering the figures
+    render_workers: int = 2
+    # The number of the files fetched ahead of the loading
+    prefetch_files: int = 2
+    # The cap of the size of the files fetched ahead
+    prefetch_memory_gb: float = 2.0
+
+
+@dataclass
+class Cache:
+    # The size budget of the cache directories, the least recently used ones are evicted over it
+    cache_budget_gb: float = 50.0
+    # Whether the signals of the found files are decoded into the cache, they are decoded on first use if not
+    cache_signals: bool = False
+
+
+@dataclass
+class Stage:
+    # Whether the files of the network share are copied to the local disk before loading
+    stage_files: bool = False
+    # The size budget of the staged files
+    stage_budget_gb: float = 20.0
+
+
+@dataclass
+class Conf(Base, Data, Pipeline, Cache, Stage):
     author: str = "default"
 
 
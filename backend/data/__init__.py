@@ -17,11 +17,18 @@ Functions:
 
 # %% ---- 2024-02-21 ------------------------
 # Requirements and constants
+import sys
 from pathlib import Path
 from datetime import datetime
 
 from loguru import logger
 
+# ! --------------------
+# ! Very important imports
+# ! The util package of the python folder is shared with the backend
+p = Path(__file__).parent.parent.parent.joinpath("python")  # noqa
+sys.path.append(p.as_posix())  # noqa
+
 
 # %% ---- 2024-02-21 ------------------------
 # Function and class
@@ -7,6 +7,14 @@ Copyright & Email: chuncheng.zhang@ia.ac.cn
 Purpose:
     Cache system at runtime operations.
 
+    The decoded signals are kept in the cache directory as the channel-major .npy file,
+    it is written chunk by chunk when the signals are first required, and opened memory-mapped by the later loads,
+    so the same session is not decoded again, and the processes share the pages.
+
+    The cache directory is the entry of the sharded cache store,
+    it is pinned while the CacheData is alive, so it is not evicted in use.
+    The cache files are written atomically, and computed once across the processes with the lock files.
+
 Functions:
     1. Requirements and constants
     2. Function and class
@@ -17,14 +25,30 @@ Functions:
 
 # %% ---- 2024-02-21 ------------------------
 # Requirements and constants
+import mne
+import weakref
+import numpy as np
+
 from omegaconf import OmegaConf
 from pathlib import Path
+from typing import Callable
 
 from . import logger
+from .cache_store import cache_store, atomic_path, FileLock
+
+# The files of the signal store in the cache directory
+signal_name = "signal.npy"
+signal_info_name = "signal.yaml"
+signal_annotations_name = "signal-annot.fif"
 
 
 # %% ---- 2024-02-21 ------------------------
 # Function and class
+def _release_cache(unique: str, token: str):
+    cache_store.update_size(unique)
+    cache_store.unpin(token)
+
+
 class CacheData(object):
     def __init__(self, file_info: dict):
         self.file_info = file_info.copy()
@@ -54,16 +78,136 @@ class CacheData(object):
             Path: The path to the cache directory.
         """
 
-        cache = Path("cache", self.file_info["unique"])
-        cache.mkdir(exist_ok=True, parents=True)
+        unique = self.file_info["unique"]
+        token = cache_store.pin(unique)
+        self._release = weakref.finalize(self, _release_cache, unique, token)
+
+        cache = cache_store.touch(unique)
         self.file_info["cache_path"] = cache
 
         conf = OmegaConf.create(self.file_info)
-        OmegaConf.save(conf, self.to_cache("file_info.yaml"))
+        with atomic_path(self.to_cache("file_info.yaml")) as tmp:
+            OmegaConf.save(conf, tmp)
 
         logger.debug(f"Using cache: {self.file_info}")
         return cache
 
+    def cache_lock(self, subpath: Path) -> FileLock:
+        """
+        Returns the lock of computing the file within the cache directory, it is shared across the processes.
+        The holder computes the file, the others wait and reuse it.
+
+        Args:
+            subpath (Path): The subpath of the file within the cache directory.
+
+        Returns:
+            FileLock: The lock.
+        """
+
+        return FileLock(self.to_cache(f"{subpath}.lock"))
+
+    def release_cache(self):
+        """
+        Records the size of the cache directory and unpins it, it can be evicted since then.
+        It is called when the CacheData is garbage collected, or it can be called explicitly.
+        """
+
+        self._release()
+
+    def has_signals(self) -> bool:
+        """
+        Returns whether the signal store is in the cache directory.
+        The info file is written at last, so the store is complete if it exists.
+        """
+
+        return self.file_info["cache_path"].joinpath(signal_info_name).is_file()
+
+    def save_signals(
+        self,
+        raw: mne.io.BaseRaw,
+        chunk_seconds: float = 60,
+        read_chunk: Callable = None,
+    ):
+        """
+        Saves the decoded signals of the raw into the cache directory.
+        The signals are decoded chunk by chunk, so the memory is bounded by the chunk.
+
+        ! The signals are stored in float64, the same dtype as the raw,
+        ! so the RawArray uses the memory-mapped store without copying it.
+
+        Args:
+            raw (mne.io.BaseRaw): The raw data, it is not required to be loaded.
+            chunk_seconds (float, optional): The seconds of every chunk. Defaults to 60.
+            read_chunk (Callable, optional): read_chunk(start, stop) returns the signals of the samples. Defaults to raw.get_data.
+
+        Returns:
+            Path: The path of the signal store.
+        """
+
+        if read_chunk is None:
+
+            def read_chunk(start, stop):
+                return raw.get_data(start=start, stop=stop)
+
+        n_channels, n_times = len(raw.ch_names), int(raw.n_times)
+        chunk_size = max(int(chunk_seconds * raw.info["sfreq"]), 1)
+
+        path = self.to_cache(signal_name)
+        with atomic_path(path) as tmp:
+            data = np.lib.format.open_memmap(
+                tmp, mode="w+", dtype=np.float64, shape=(n_channels, n_times)
+            )
+            for start in range(0, n_times, chunk_size):
+                stop = min(start + chunk_size, n_times)
+                data[:, start:stop] = read_chunk(start, stop)
+            data.flush()
+            del data
+
+        with atomic_path(self.to_cache(signal_annotations_name)) as tmp:
+            raw.annotations.save(tmp, overwrite=True)
+
+        meas_date = raw.info["meas_date"]
+        info = dict(
+            ch_names=raw.ch_names,
+            ch_types=raw.get_channel_types(),
+            sfreq=float(raw.info["sfreq"]),
+            n_times=n_times,
+            chunk_size=chunk_size,
+            meas_date=None if meas_date is None else meas_date.timestamp(),
+        )
+        with atomic_path(self.to_cache(signal_info_name)) as tmp:
+            OmegaConf.save(OmegaConf.create(info), tmp)
+
+        cache_store.update_size(self.file_info["unique"])
+        logger.debug(f"Saved signals: {path}, {n_channels} x {n_times}")
+        return path
+
+    def load_signals(self) -> mne.io.RawArray:
+        """
+        Loads the raw from the signal store without copying the signals.
+        The store is memory-mapped copy-on-write, the raw can be modified without touching the store.
+
+        Returns:
+            mne.io.RawArray | None: The raw, or None if the store is not in the cache directory.
+        """
+
+        if not self.has_signals():
+            return None
+
+        info = OmegaConf.to_container(OmegaConf.load(self.to_cache(signal_info_name)))
+        data = np.load(self.to_cache(signal_name), mmap_mode="c")
+
+        raw_info = mne.create_info(info["ch_names"], info["sfreq"], info["ch_types"])
+        raw = mne.io.RawArray(data, raw_info, verbose=False)
+        if info["meas_date"] is not None:
+            raw.set_meas_date(info["meas_date"])
+
+        annotations = mne.read_annotations(self.to_cache(signal_annotations_name))
+        raw.set_annotations(annotations)
+
+        logger.debug(f"Loaded signals: {self.to_cache(signal_name)}, {data.shape}")
+        return raw
+
 
 # %% ---- 2024-02-21 ------------------------
 # Play ground
@@ -0,0 +1,454 @@
+"""
+File: cache_store.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The sharded cache directories with the size budget.
+
+    Every file's cache directory is placed in the shard of its hash prefix,
+    like cache/data/3f/<unique>, so no directory grows too large to list.
+    The manifest records the size and the last access time of every entry,
+    it is the SQLite database since several processes share the cache.
+    The least recently used entries are evicted in the background when the total size exceeds the budget,
+    and the entries in use are pinned, they are never evicted.
+
+    The files are written into the temporary paths and renamed atomically,
+    and the lock files coordinate the processes computing the same artifact,
+    the first one computes it, and the others wait and reuse it.
+    The lock files are locked with the file locks of the system,
+    so the lock of a crashed process is released by the system, and never broken by the others.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import threading
+import contextlib
+
+from pathlib import Path
+
+from . import logger
+
+# The file locks of the system, they are released when the process exits
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# The schema of the manifest
+schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    unique_name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL DEFAULT 0,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed);
+
+CREATE TABLE IF NOT EXISTS pins (
+    token TEXT PRIMARY KEY,
+    unique_name TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    since REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pins_unique_name ON pins (unique_name);
+"""
+
+# The default size budget of the cache, 50 GB
+default_budget = 50 * 1024**3
+
+# The pins of the processes not running are dropped after it, 1 day,
+# the owner may run in another pid namespace sharing the cache, like another container
+default_pin_timeout = 24 * 3600
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _dir_size(path: Path) -> int:
+    """
+    Returns the total bytes of the files in the directory, 0 if it does not exist.
+    """
+    size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                size += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _pid_alive(pid: int) -> bool:
+    """
+    Returns whether the process of the pid is running on this machine.
+    """
+    if pid == os.getpid():
+        return True
+
+    if os.name == "nt":
+        import ctypes
+
+        # The os.kill terminates the process on Windows, so it is queried instead
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            # STILL_ACTIVE
+            return code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # It runs as another user
+        return True
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def atomic_path(path: Path):
+    """
+    Yields the temporary path to write, and renames it to the path atomically if succeeded.
+    The temporary path ends with the name of the path, so the writers still know its format.
+
+    Args:
+        path (Path): The path to write.
+
+    Yields:
+        Path: The temporary path.
+    """
+    path = Path(path)
+    tmp = path.with_name(f"tmp-{uuid.uuid4().hex[:8]}-{path.name}")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class FileLock(object):
+    """
+    The lock across the processes, it is the system lock of the lock file,
+    like the fcntl.flock or msvcrt.locking.
+    The system releases it when the holder exits, even if it crashes.
+
+    ! The lock file is kept after released,
+    ! removing it would let the waiters lock the removed file while others lock the new one.
+
+    Attributes:
+        path (Path): The path of the lock file.
+        poll (float): The seconds between the tries of the waiter.
+    """
+
+    def __init__(self, path: Path, poll: float = 0.1):
+        self.path = Path(path)
+        self.poll = poll
+        self._fd = None
+
+    def _try_acquire(self, fd: int) -> bool:
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self):
+        """
+        Waits until the lock is acquired.
+        """
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        waited = False
+        try:
+            while not self._try_acquire(fd):
+                if not waited:
+                    logger.debug(f"Waiting for lock: {self.path}")
+                    waited = True
+                time.sleep(self.poll)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class CacheStore(object):
+    """
+    The sharded cache directories, with the manifest of their sizes and access times.
+
+    Attributes:
+        root (Path): The root folder of the shards.
+        budget (int): The size budget in bytes, the LRU entries are evicted over it.
+        pin_timeout (float): The seconds after which the pin of a process not running is dropped,
+                             the pins of the running processes are kept however old they are.
+    """
+
+    def __init__(
+        self,
+        root: Path = Path("cache", "data"),
+        budget: int = default_budget,
+        pin_timeout: float = default_pin_timeout,
+    ):
+        self.root = Path(root)
+        self.budget = budget
+        self.pin_timeout = pin_timeout
+        self._lock = threading.Lock()
+        self._evicting = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root.joinpath("manifest.sqlite")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The connection of the current thread, the eviction runs in its own thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.root.mkdir(exist_ok=True, parents=True)
+            conn = sqlite3.connect(self.manifest_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(schema)
+            self._local.conn = conn
+        return conn
+
+    def path_of(self, unique: str) -> Path:
+        """
+        Returns the cache directory of the unique name, in the shard of its hash prefix.
+        """
+        shard = hashlib.md5(unique.encode()).hexdigest()[:2]
+        return self.root.joinpath(shard, unique)
+
+    def touch(self, unique: str) -> Path:
+        """
+        Records the access of the entry, and creates its cache directory.
+        The entry should be pinned before, or it may be evicted at any time.
+
+        Returns:
+            Path: The cache directory.
+        """
+        path = self.path_of(unique)
+        with self._lock, self.conn as conn:
+            path.mkdir(exist_ok=True, parents=True)
+            conn.execute(
+                """INSERT INTO entries (unique_name, accessed) VALUES (?, ?)
+                ON CONFLICT (unique_name) DO UPDATE SET accessed = excluded.accessed""",
+                (unique, time.time()),
+            )
+        return path
+
+    def update_size(self, unique: str) -> int:
+        """
+        Records the current size of the entry, and starts the eviction if it is over the budget.
+
+        Returns:
+            int: The size of the entry in bytes.
+        """
+        size = _dir_size(self.path_of(unique))
+        with self.conn as conn:
+            conn.execute(
+                "UPDATE entries SET size = ? WHERE unique_name = ?", (size, unique)
+            )
+        if self.total_size() > self.budget:
+            self.evict_in_background()
+        return size
+
+    def total_size(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def pin(self, unique: str) -> str:
+        """
+        Pins the entry in use, it is not evicted until unpinned.
+
+        Returns:
+            str: The token of the pin, it is used to unpin.
+        """
+        token = uuid.uuid4().hex
+        with self.conn as conn:
+            conn.execute(
+                "INSERT INTO pins (token, unique_name, pid, since) VALUES (?, ?, ?, ?)",
+                (token, unique, os.getpid(), time.time()),
+            )
+        return token
+
+    def unpin(self, token: str):
+        """
+        Removes the pin of the token.
+        """
+        try:
+            with self.conn as conn:
+                conn.execute("DELETE FROM pins WHERE token = ?", (token,))
+        except sqlite3.Error as err:
+            logger.warning(f"Failed unpinning cache entry: {token}, {err}")
+
+    def evict(self, budget: int = None) -> list:
+        """
+        Evicts the least recently used entries until the total size is within the budget.
+        The pinned entries are skipped.
+
+        Args:
+            budget (int, optional): The size budget in bytes, defaults to self.budget.
+
+        Returns:
+            list: The unique names of the evicted entries.
+        """
+        if budget is None:
+            budget = self.budget
+
+        conn = self.conn
+        total = self.total_size()
+        if total <= budget:
+            return []
+
+        # The old pins left by the processes not running are dropped
+        cutoff = time.time() - self.pin_timeout
+        old = conn.execute(
+            "SELECT DISTINCT pid FROM pins WHERE since < ?", (cutoff,)
+        ).fetchall()
+        gone = [(pid, cutoff) for pid, in old if not _pid_alive(pid)]
+        with conn:
+            conn.executemany("DELETE FROM pins WHERE pid = ? AND since < ?", gone)
+
+        rows = conn.execute("""SELECT unique_name, size FROM entries
+            WHERE unique_name NOT IN (SELECT unique_name FROM pins)
+            ORDER BY accessed""").fetchall()
+
+        evicted = []
+        for unique, size in rows:
+            if total <= budget:
+                break
+
+            trash = self.root.joinpath("trash", f"{unique}-{uuid.uuid4().hex[:8]}")
+            try:
+                with self._lock, conn:
+                    # The entry may be pinned or accessed after the selection
+                    cursor = conn.execute(
+                        """DELETE FROM entries WHERE unique_name = ? AND NOT EXISTS (
+                            SELECT 1 FROM pins WHERE pins.unique_name = entries.unique_name)""",
+                        (unique,),
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+
+                    # The directory is moved out inside the transaction,
+                    # so the pin of another process waits until it is gone,
+                    # and the half-removed directory is never seen as the entry
+                    trash.parent.mkdir(exist_ok=True)
+                    try:
+                        os.rename(self.path_of(unique), trash)
+                    except FileNotFoundError:
+                        trash = None
+            except OSError as err:
+                # The directory is in use, like the memory-mapped files on Windows,
+                # the entry is kept since the transaction is rolled back
+                logger.warning(f"Skipped evicting cache entry: {unique}, {err}")
+                continue
+
+            if trash is not None:
+                shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+            evicted.append(unique)
+
+        # The trash left by the crashed or failed removals
+        self.empty_trash()
+
+        logger.debug(
+            f"Evicted {len(evicted)} cache entries, total size is {total} | {budget} bytes"
+        )
+        return evicted
+
+    def empty_trash(self):
+        """
+        Removes the directories moved to the trash, the ones in use are left for the next time.
+        """
+        trash = self.root.joinpath("trash")
+        if not trash.is_dir():
+            return
+        for path in trash.iterdir():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def evict_in_background(self) -> threading.Thread:
+        """
+        Starts the eviction in the background thread, unless one is running.
+
+        Returns:
+            threading.Thread | None: The thread of the eviction, or None if one is running.
+        """
+        if not self._evicting.acquire(blocking=False):
+            return None
+
+        def _evict():
+            try:
+                self.evict()
+            except Exception as err:
+                logger.error(f"Failed evicting cache entries: {err}")
+            finally:
+                self._evicting.release()
+
+        thread = threading.Thread(target=_evict, daemon=True, name="cache-evict")
+        thread.start()
+        return thread
+
+
+# The cache store shared by the process
+cache_store = CacheStore()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
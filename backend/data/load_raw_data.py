@@ -18,28 +18,113 @@ Functions:
 # %% ---- 2024-02-21 ------------------------
 # Requirements and constants
 import mne
+import threading
+
+from pathlib import Path
+
+from util.catalog import indexed_events
+from util.bdf_reader import BDFReader, read_raw_bdf
+from util.bdf_header import HeaderRaw
 
 from . import logger
-from .cache_data import CacheData
+from .cache_data import CacheData, signal_name
+from .render_figures import figure_queue, render_events_figure
+from .stage_files import staging
+
+# The prepared montages shared by the process,
+# {(montage_name, rename_channels): montage} and {(montage_name, rename_channels, ch_names): prepared}
+_montages = {}
+_prepared_montages = {}
+_montages_lock = threading.Lock()
 
 
 # %% ---- 2024-02-21 ------------------------
 # Function and class
+def prepare_montage(montage_name: str, rename_channels: dict, ch_names: list) -> tuple:
+    """
+    Prepares the standard montage for the channel names, it is cached for the process.
+    The cache hit is a dict lookup, and the cache is safe to use from the threads.
+
+    ! The montage is shared, it should not be modified.
+
+    Args:
+        montage_name (str): The name of the standard montage.
+        rename_channels (dict): The mapping of the montage's channel names, or None.
+        ch_names (list): The channel names of the raw.
+
+    Returns:
+        mne.channels.DigMontage: The montage with the upper case channel names.
+        dict: The mapping of the raw's channel names to upper case.
+        list: The upper case channel names inside the montage.
+        list: The upper case channel names outside the montage.
+    """
+
+    renamed = (
+        None if rename_channels is None else tuple(sorted(rename_channels.items()))
+    )
+    key = (montage_name, renamed, tuple(ch_names))
+
+    prepared = _prepared_montages.get(key)
+    if prepared is not None:
+        return prepared
+
+    with _montages_lock:
+        if key in _prepared_montages:
+            return _prepared_montages[key]
+
+        montage = _montages.get(key[:2])
+        if montage is None:
+            montage = mne.channels.make_standard_montage(montage_name)
+
+            if rename_channels is not None:
+                montage.rename_channels(rename_channels)
+                logger.debug(f"Renamed channels at standard montage: {rename_channels}")
+
+            montage.rename_channels({n: n.upper() for n in montage.ch_names})
+            _montages[key[:2]] = montage
+
+        mapping = {n: n.upper() for n in ch_names}
+        montage_ch_names = set(montage.ch_names)
+        inside = [e for e in mapping.values() if e in montage_ch_names]
+        outside = [e for e in mapping.values() if e not in montage_ch_names]
+
+        prepared = (montage, mapping, inside, outside)
+        _prepared_montages[key] = prepared
+        logger.debug(f"Prepared montage: {montage_name} for {len(ch_names)} channels")
+        return prepared
+
+
 class LoadRawData(CacheData):
-    def __init__(self, file_info: dict):
+    def __init__(self, file_info: dict, read_signals: bool = True):
         super().__init__(file_info)
+        if not read_signals:
+            # Only the header and the events are read,
+            # the signals are read around the epochs later
+            self.load_header()
+            self.get_events()
+            return
         self.load_raw()
         self.standard_montage()
         self.get_events()
         self.filter_ch_names()
 
+    def load_header(self):
+        """
+        Loads the header of the data.bdf and the annotations of the evt.bdf, without the signals.
+
+        Returns:
+            HeaderRaw: The header-only raw.
+        """
+
+        path = self.file_info["path"]
+        raw = HeaderRaw(path, path.parent.joinpath("evt.bdf"))
+        self.raw = raw
+        return raw
+
     def filter_ch_names(self):
-        self.ch_names_inside_montage = [
-            e for e in self.raw.ch_names if e in self.montage.ch_names
-        ]
-        self.ch_names_outside_montage = [
-            e for e in self.raw.ch_names if e not in self.montage.ch_names
-        ]
+        # The split is prepared with the montage
+        self.ch_names_inside_montage = list(self.ch_names_split[0])
+        self.ch_names_outside_montage = list(self.ch_names_split[1])
         logger.debug(
             f"Filtered ch_names inside: {self.ch_names_inside_montage} outside: {self.ch_names_outside_montage}"
         )
@@ -47,6 +132,8 @@ class LoadRawData(CacheData):
     def load_raw(self):
         """
         Loads the raw data from a file.
+        The signals are not read, the raw is the memory-mapped signal store if it is in the cache,
+        or the raw of the file without the data loaded, see load_data.
 
         Returns:
             mne.io.Raw | None: The loaded raw data, or None if loading failed.
@@ -56,13 +143,17 @@ class LoadRawData(CacheData):
 
         if self.file_info["file_name"] == "data.bdf":
             not_loaded = False
-            path = self.file_info["path"]
-            raw = mne.io.read_raw(path)
-            annotations = mne.read_annotations(path.parent.joinpath("evt.bdf"))
-            raw.set_annotations(annotations, verbose=True)
-            logger.debug(
-                f"Cloned annotations {annotations} from evt.bdf to the raw of data.bdf"
-            )
+
+            if self.has_signals():
+                raw = self.load_signals()
+            else:
+                path = self.file_info["path"]
+                raw = mne.io.read_raw(path)
+                annotations = mne.read_annotations(path.parent.joinpath("evt.bdf"))
+                raw.set_annotations(annotations, verbose=True)
+                logger.debug(
+                    f"Cloned annotations {annotations} from evt.bdf to the raw of data.bdf"
+                )
             logger.debug(f"Loaded raw: {raw}")
 
         if not_loaded:
@@ -72,6 +163,75 @@ class LoadRawData(CacheData):
         self.raw = raw
         return raw
 
+    def load_data(self, picks: list = None):
+        """
+        Loads the signals of the raw, the montage is applied again.
+        The whole file is decoded into the signal store in the cache on the first call,
+        chunk by chunk, and the later calls use the memory-mapped store.
+        The picked channels are read without the store, if it is not in the cache.
+
+        Args:
+            picks (list, optional): The channel names, case insensitive. Defaults to all the channels.
+
+        Returns:
+            mne.io.Raw: The raw with the signals.
+        """
+
+        path = self.file_info["path"]
+
+        if picks is not None and not self.has_signals():
+            # The files are read from the local disk if the staging is enabled
+            with staging.staged(path, path.parent.joinpath("evt.bdf")) as (
+                path,
+                evt_path,
+            ):
+                raw = read_raw_bdf(path, evt_path, picks=picks)
+        else:
+            # Only one process decodes the file,
+            # the others wait and use the decoded signals in the cache
+            with self.cache_lock(signal_name):
+                if not self.has_signals():
+                    with staging.staged(path, path.parent.joinpath("evt.bdf")) as (
+                        path,
+                        evt_path,
+                    ):
+                        self.save_raw_signals(path, evt_path)
+            raw = self.load_signals()
+            if picks is not None:
+                names = {e.upper(): e for e in raw.ch_names}
+                raw.pick([names[e.upper()] for e in picks])
+
+        self.raw = raw
+        self.standard_montage()
+        logger.debug(f"Loaded data: {raw}")
+        return raw
+
+    def save_raw_signals(self, path: Path, evt_path: Path):
+        """
+        Decodes the data.bdf into the signal store, chunk by chunk.
+        The samples are decoded in bulk, the stim channels and the channels of lower rates are decoded by the mne.
+
+        Args:
+            path (Path): The data.bdf.
+            evt_path (Path): The evt.bdf, its annotations are saved with the signals.
+
+        Returns:
+            Path: The path of the signal store.
+        """
+
+        raw = mne.io.read_raw(path)
+        raw.set_annotations(mne.read_annotations(evt_path))
+
+        reader = BDFReader(path)
+        idx = reader.pick_idx()
+        if not reader.is_plain(idx) or len(idx) != len(raw.ch_names):
+            return self.save_signals(raw)
+
+        def read_chunk(start, stop):
+            return reader.read_samples(idx, start, stop)
+
+        return self.save_signals(raw, read_chunk=read_chunk)
+
     def get_events(self):
         """
         Extracts events and event IDs from the raw data.
@@ -80,18 +240,31 @@ class LoadRawData(CacheData):
             tuple: A tuple containing the events array and the event ID dictionary.
         """
 
-        events, event_id = mne.events_from_annotations(self.raw)
+        # The events indexed in the catalog are used without parsing the annotations again,
+        # unless the file is changed since indexed, see Catalog.events_of
+        indexed = indexed_events(
+            self.file_info["path"], content=self.file_info.get("content")
+        )
+        if indexed is None and isinstance(self.raw, HeaderRaw):
+            events, event_id = self.raw.events_from_annotations()
+        elif indexed is None:
+            events, event_id = mne.events_from_annotations(self.raw)
+        else:
+            events, event_id = indexed
+            logger.debug(f"Used indexed events of {self.file_info['path']}")
+
         self.events = events
         self.event_id = event_id
         logger.debug(f"Got events (shape):{events.shape}, event_id: {event_id}")
-        fig = mne.viz.plot_events(
+
+        # The figure is rendered in the background, the loading does not wait for it
+        figure_queue.submit(
+            render_events_figure,
+            self.to_cache("raw-events.jpg"),
             events,
-            sfreq=self.raw.info["sfreq"],
-            event_id=event_id,
-            show=False,
+            float(self.raw.info["sfreq"]),
+            event_id,
         )
-        fig.suptitle("Raw events")
-        fig.savefig(self.to_cache("raw-events.jpg"))
         return events, event_id
 
     def standard_montage(
@@ -108,19 +281,13 @@ class LoadRawData(CacheData):
             mne.channels.DigMontage: The applied standard montage.
         """
 
-        montage = mne.channels.make_standard_montage(montage_name)
-
-        if rename_channels is not None:
-            montage.rename_channels(rename_channels)
-            logger.debug(f"Renamed channels at standard montage: {rename_channels}")
-
-        mapping = {n: n.upper() for n in self.raw.ch_names}
+        montage, mapping, inside, outside = prepare_montage(
+            montage_name, rename_channels, self.raw.ch_names
+        )
         self.raw.rename_channels(mapping)
 
-        mapping = {n: n.upper() for n in montage.ch_names}
-        montage.rename_channels(mapping)
-
         self.montage = montage
+        self.ch_names_split = (inside, outside)
         self.raw.set_montage(montage, on_missing="warn")
 
         logger.debug(f"Applied standard montage: {montage_name} to raw")
@@ -0,0 +1,152 @@
+"""
+File: pipeline.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Streaming pipeline from the file discovery to the data loading.
+
+    The producer thread walks the files into a bounded queue,
+    and the consumer threads load them while the discovery is still running.
+    The bounded queues keep the back-pressure,
+    the discovery waits when the loaders are busy,
+    and the loaders wait when the loaded objects are not taken away.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import queue
+import threading
+import traceback
+
+from typing import Callable, Iterable
+
+from . import logger
+
+# The end of the queue
+_done = object()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _put(q: queue.Queue, item, stop: threading.Event):
+    """
+    Puts the item into the queue, and gives up when the pipeline is stopped.
+
+    Returns:
+        bool: Whether the item is put.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def stream_load(
+    files: Iterable,
+    load: Callable,
+    n_workers: int = 2,
+    queue_size: int = 4,
+    on_done: Callable = None,
+):
+    """
+    Loads the files with n_workers threads while the files are being found.
+
+    Args:
+        files (Iterable): The file infos, usually RawDataFiles.find_all(stream=True).
+        load (Callable): The loader of the file info, usually LoadRawData.
+        n_workers (int, optional): The number of the loading threads, defaults to 2.
+        queue_size (int, optional): The size of the bounded queues, defaults to 4.
+        on_done (Callable, optional): It is called as on_done(file_info) when the file is loaded or failed, like Prefetch.release.
+
+    Yields:
+        tuple: (file_info, loaded, error), the loaded is None and the error is the traceback if failed.
+               The order is the finishing order, not the found order.
+    """
+    todo = queue.Queue(maxsize=queue_size)
+    done = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def _produce():
+        try:
+            for file_info in files:
+                if not _put(todo, file_info, stop):
+                    break
+        except Exception:
+            logger.error(f"Failed finding files: {traceback.format_exc()}")
+        finally:
+            if hasattr(files, "close"):
+                files.close()
+            for _ in range(n_workers):
+                _put(todo, _done, stop)
+
+    def _consume():
+        while not stop.is_set():
+            try:
+                file_info = todo.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if file_info is _done:
+                break
+
+            try:
+                output = (file_info, load(file_info), None)
+            except Exception:
+                error = traceback.format_exc()
+                logger.error(f"Failed loading: {file_info}, {error}")
+                output = (file_info, None, error)
+            finally:
+                if on_done is not None:
+                    on_done(file_info)
+
+            if not _put(done, output, stop):
+                break
+
+        _put(done, _done, stop)
+
+    threads = [threading.Thread(target=_produce, daemon=True, name="pipeline-produce")]
+    threads.extend(
+        threading.Thread(target=_consume, daemon=True, name=f"pipeline-consume-{i}")
+        for i in range(n_workers)
+    )
+
+    for t in threads:
+        t.start()
+    logger.debug(f"Started pipeline with {n_workers} workers")
+
+    try:
+        running = n_workers
+        while running > 0:
+            output = done.get()
+            if output is _done:
+                running -= 1
+                continue
+            yield output
+    finally:
+        # The generator is closed or exhausted
+        stop.set()
+        logger.debug("Stopped pipeline")
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
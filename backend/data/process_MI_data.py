@@ -7,6 +7,9 @@ Copyright & Email: chuncheng.zhang@ia.ac.cn
 Purpose:
     Process the MI data.
 
+    The epochs are read with the pushdown of the event windows,
+    only the data records overlapping the epochs are read from the data.bdf.
+
 Functions:
     1. Requirements and constants
     2. Function and class
@@ -19,19 +22,61 @@ Functions:
 # Requirements and constants
 import mne
 
+from util.bdf_reader import read_epochs_bdf
+
 from . import logger
 from .load_raw_data import LoadRawData
 
+# The default parameters, the same as the MIDefaultOptions of the MIWindow
+default_parameters = dict(
+    channels=["C3", "CZ", "C4"],
+    eventIds=["200", "201", "202"],
+    epochTimes=dict(tmin=-1.0, tmax=5.0),
+    freqBand=dict(freq_l=1.0, freq_h=25.0),
+    rejects=dict(eeg=1e-6),
+    epochsKwargs=dict(baseline=(None, 0), decim=10),
+    # The seconds padded on both sides of the epochs for the filter
+    filterPadding=2.0,
+)
+
 
 # %% ---- 2024-02-21 ------------------------
 # Function and class
 class ProcessMIData(LoadRawData):
     def __init__(self, file_info: dict, parameters: dict):
-        super().__init__(file_info)
+        self.parameters = default_parameters | (parameters or {})
+        super().__init__(file_info, read_signals=False)
         self.get_epochs()
 
     def get_epochs(self):
-        pass
+        """
+        Reads the epochs of the events, only the data records around the epochs are read.
+
+        Returns:
+            mne.Epochs: The epochs, the channel names are upper case as the montage.
+        """
+
+        p = self.parameters
+        event_id = {k: v for k, v in self.event_id.items() if k in p["eventIds"]}
+
+        epochs = read_epochs_bdf(
+            self.file_info["path"],
+            self.events,
+            event_id,
+            tmin=p["epochTimes"]["tmin"],
+            tmax=p["epochTimes"]["tmax"],
+            picks=p["channels"],
+            pad=p["filterPadding"],
+            l_freq=p["freqBand"]["freq_l"],
+            h_freq=p["freqBand"]["freq_h"],
+            reject=p["rejects"],
+            **p["epochsKwargs"],
+        )
+        epochs.rename_channels({n: n.upper() for n in epochs.ch_names})
+
+        self.epochs = epochs
+        logger.debug(f"Got epochs: {epochs}")
+        return epochs
 
 
 # %% ---- 2024-02-21 ------------------------
@@ -0,0 +1,248 @@
+"""
+File: render_figures.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Render the diagnostic figures out of the loading path.
+
+    The figures are put into the queue, and rendered by the pool of the worker processes,
+    with the headless Agg backend of the matplotlib.
+    The figure is skipped if it is cached and its inputs are unchanged,
+    and the figure is always closed after saved.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import hashlib
+import threading
+import numpy as np
+import multiprocessing as mp
+import concurrent.futures
+
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from . import logger
+from .cache_store import FileLock, atomic_path
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _init_headless():
+    """
+    Initializes the worker process with the headless backend.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _signature(*args) -> str:
+    """
+    Returns the md5 of the inputs of the figure.
+    """
+    h = hashlib.md5()
+    for e in args:
+        if isinstance(e, np.ndarray):
+            h.update(np.ascontiguousarray(e).tobytes())
+        else:
+            h.update(repr(e).encode())
+    return h.hexdigest()
+
+
+def _chain(inner: Future, outer: Future):
+    """
+    Copies the outcome of the inner future to the outer one.
+    """
+    if inner.cancelled():
+        outer.cancel()
+    elif inner.exception() is not None:
+        outer.set_exception(inner.exception())
+    else:
+        outer.set_result(inner.result())
+
+
+def render_events_figure(
+    path: Path, events: np.ndarray, sfreq: float, event_id: dict
+) -> bool:
+    """
+    Renders the figure of the events, unless it is cached with the same inputs.
+
+    Args:
+        path (Path): The path of the figure, like the raw-events.jpg in the cache directory.
+        events (np.ndarray): The events array.
+        sfreq (float): The sampling frequency.
+        event_id (dict): The event_id.
+
+    Returns:
+        bool: Whether the figure is rendered.
+    """
+    import mne
+    import matplotlib.pyplot as plt
+
+    path = Path(path)
+    if not path.parent.is_dir():
+        # The cache directory is evicted
+        return False
+
+    signature = _signature(events, sfreq, sorted(event_id.items()))
+    signature_path = path.with_name(f"{path.name}.md5")
+
+    # The same lock as the CacheData.cache_lock of the figure
+    with FileLock(path.with_name(f"{path.name}.lock")):
+        if (
+            path.is_file()
+            and signature_path.is_file()
+            and signature_path.read_text() == signature
+        ):
+            return False
+
+        fig = mne.viz.plot_events(events, sfreq=sfreq, event_id=event_id, show=False)
+        try:
+            fig.suptitle("Raw events")
+            with atomic_path(path) as tmp:
+                fig.savefig(tmp)
+        finally:
+            plt.close(fig)
+
+        with atomic_path(signature_path) as tmp:
+            tmp.write_text(signature)
+
+    return True
+
+
+class FigureQueue(object):
+    """
+    The queue of the figures, they are rendered by the worker processes.
+    The pool is started on the first figure.
+
+    The figure of the same path and the same inputs is rendered once.
+    If the inputs of the path change while it is pending,
+    the figure is rendered again with the latest inputs after the pending one,
+    so the figure on the disk is always made of the latest inputs.
+
+    Attributes:
+        max_workers (int): The number of the rendering processes.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor = None
+        # The rendering figures, {key: (signature, future)}
+        self._pending = {}
+        # The figures rendered again after the pending ones, {key: (signature, func, path, args, future)}
+        self._queued = {}
+        # Reentrant, the callback of a finished future runs in the submitting thread
+        self._lock = threading.RLock()
+
+    def _start(self, key, signature, func, path, args) -> Future:
+        # It is called with the lock
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.max_workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_headless,
+            )
+        future = self._executor.submit(func, path, *args)
+        self._pending[key] = (signature, future)
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            queued = None
+            if self._pending.get(key, (None, None))[1] is future:
+                self._pending.pop(key)
+                queued = self._queued.pop(key, None)
+
+            if queued is not None:
+                signature, func, path, args, outer = queued
+                try:
+                    inner = self._start(key, signature, func, path, args)
+                    inner.add_done_callback(lambda f: _chain(f, outer))
+                except RuntimeError as err:
+                    # The pool is shut down
+                    outer.set_exception(err)
+
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed rendering figure: {key}, {error}")
+        elif future.result():
+            logger.debug(f"Rendered figure: {key}")
+
+    def submit(self, func, path: Path, *args) -> Future:
+        """
+        Puts the figure into the queue.
+        The figure of the same path and inputs pending is not put again,
+        and the figure of the same path but other inputs is rendered after the pending one.
+
+        Args:
+            func (Callable): The render function, func(path, *args), like render_events_figure.
+            path (Path): The path of the figure.
+            *args: The inputs of the figure.
+
+        Returns:
+            concurrent.futures.Future: The future of the rendering.
+        """
+        key = Path(path).as_posix()
+        signature = _signature(*args)
+        with self._lock:
+            if key not in self._pending:
+                return self._start(key, signature, func, path, args)
+
+            if self._pending[key][0] == signature:
+                return self._pending[key][1]
+
+            # The inputs changed, the latest ones are rendered after the pending figure
+            queued = self._queued.get(key)
+            outer = Future() if queued is None else queued[4]
+            self._queued[key] = (signature, func, path, args, outer)
+            return outer
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stops the pool, and waits for the pending figures if wait.
+        """
+        if wait:
+            while True:
+                with self._lock:
+                    futures = [e[1] for e in self._pending.values()]
+                    futures += [e[4] for e in self._queued.values()]
+                if not futures:
+                    break
+                concurrent.futures.wait(futures)
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+            queued, self._queued = self._queued, {}
+        for e in queued.values():
+            e[4].cancel()
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+# The figure queue shared by the process
+figure_queue = FigureQueue()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
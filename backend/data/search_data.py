@@ -17,11 +17,13 @@ Functions:
 
 # %% ---- 2024-02-21 ------------------------
 # Requirements and constants
-import os
-
 from pathlib import Path
+from functools import partial
 from rich import print, inspect
 
+from util.walker import walk_roots, scan_dir, default_max_workers
+from util.content_fingerprint import content_fingerprint
+
 from .toolbox import md5_encode
 from . import logger
 
@@ -54,10 +56,11 @@ def check_rules():
 class RawDataFiles(object):
     check_rules = check_rules()
 
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, max_workers: int = default_max_workers):
         root = Path(root)
         assert root.is_dir(), f"Invalid directory: {root}"
         self.root = root
+        self.max_workers = max_workers
 
     def _data_info(self, path: Path):
         """
@@ -72,37 +75,109 @@ class RawDataFiles(object):
                 - subject: The name of the subject.
                 - file_name: The name of the file.
                 - path (Path): The full path to the file.
-                - unique: The MD5 hash of the file path.
+                - content: The content fingerprint of the file, the copies of the same recording share it.
+                - unique: The content fingerprint, or the MD5 hash of the file path if the file is not readable.
         """
 
         parts = path.relative_to(self.root).parts
         assert len(parts) > 2, f"Invalid path: {path}, it at least has Three parts"
+
+        try:
+            content = content_fingerprint(path, path.parent.joinpath("evt.bdf"))
+        except OSError as err:
+            logger.warning(f"Failed fingerprinting: {path}, {err}")
+            content = None
+
         return dict(
             experiment=parts[0],
             subject=parts[1],
             file_name=parts[-1],
             path=path,
-            unique=f"{'-'.join(parts[:-1])}-{md5_encode(path.as_posix())}",
+            content=content,
+            unique=content or f"{'-'.join(parts[:-1])}-{md5_encode(path.as_posix())}",
         )
 
-    def find_all(self):
+    def _scan(self, folder: str, found: dict):
+        """
+        Lists the folder and fingerprints its files, it runs in the walking threads.
+        The information of the files is put into found[folder].
+        """
+        subdirs, names = scan_dir(folder)
+        infos = []
+        for name in names:
+            if name in self.check_rules:
+                path = Path(folder, name)
+                if not self.check_rules[name](path):
+                    continue
+                try:
+                    infos.append(self._data_info(path))
+                except AssertionError as err:
+                    # The folder is still walked into
+                    logger.warning(f"Skipped file: {err}")
+        # The dict.update is atomic
+        found.update({folder: infos})
+        return subdirs, names
+
+    def iter_all(self, dedup: bool = True):
+        """
+        Yields the files that match the specified rules as soon as their folders are listed.
+        The directories are walked and the files are fingerprinted concurrently with max_workers threads.
+
+        The first copy found of every recording is yielded if dedup,
+        it depends on the walking order, use find_all for the copy of the smallest path.
+
+        Args:
+            dedup (bool, optional): Whether to skip the copies of the recordings already yielded, defaults to True.
+
+        Yields:
+            dict: The information of the file, see _data_info.
+        """
+
+        n = 0
+        m = 0
+        found = {}
+        seen = {}
+        scan = partial(self._scan, found=found)
+        for _, folder, _, _ in walk_roots([(self.root, self.max_workers)], scan=scan):
+            n += 1
+            for info in found.pop(folder, []):
+                m += 1
+                if dedup and info["unique"] in seen:
+                    logger.debug(
+                        f"Skipped copy: {info['path']}, of {seen[info['unique']]}"
+                    )
+                    continue
+                seen[info["unique"]] = info["path"]
+                yield info
+        logger.debug(f"Found {n} folders with files.")
+        logger.debug(f"Found {m} eeg files, {len(seen)} distinct recordings.")
+
+    def find_all(self, stream: bool = False, dedup: bool = True):
         """
         Finds all the files that match the specified rules within the root directory.
 
+        Args:
+            stream (bool, optional): Whether to return the generator of the files in the found order, see iter_all, defaults to False.
+            dedup (bool, optional): Whether to skip the copies of the same recording, defaults to True.
+
         Returns:
-            list: A list of file paths that match the rules.
+            list: A list of file paths that match the rules, sorted by path.
+                  The generator is returned if stream is True.
         """
 
-        found = list(os.walk(self.root))
-        logger.debug(f"Found {len(found)} folders with files.")
-        files = []
-        for folder, _, names in found:
-            for name in names:
-                if name in self.check_rules:
-                    path = Path(folder, name)
-                    if self.check_rules[name](path):
-                        files.append(self._data_info(path))
-        logger.debug(f"Found {len(files)} eeg files.")
+        if stream:
+            return self.iter_all(dedup)
+
+        files = list(self.iter_all(dedup=False))
+        files.sort(key=lambda e: e["path"].as_posix())
+
+        if dedup:
+            # The first copy of the sorted files is kept, no matter which one is found first
+            distinct = {}
+            for e in files:
+                distinct.setdefault(e["unique"], e)
+            files = list(distinct.values())
+
         return files
 
 
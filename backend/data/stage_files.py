@@ -0,0 +1,208 @@
+"""
+File: stage_files.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Stage the files of the network share on the local disk.
+
+    The mne.io.read_raw makes many small random reads, they are very slow over the SMB or NFS.
+    The data.bdf and its evt.bdf are copied in the large sequential chunks before loading,
+    and the staged files are reused across the runs while the size and mtime of the source match.
+    The staged files are the entries of the CacheStore, so the local disk usage is capped,
+    and the staged files in use are pinned.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import json
+import hashlib
+import contextlib
+
+from pathlib import Path
+
+from . import logger
+from .cache_store import CacheStore, FileLock, atomic_path
+
+# The bytes of every chunk of the copy, 16 MB
+default_chunk_size = 16 * 1024**2
+
+# The default size budget of the staged files, 20 GB
+default_stage_budget = 20 * 1024**3
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _signature(path: Path) -> list:
+    """
+    Returns the [size, mtime_ns] of the file.
+    """
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def copy_in_chunks(src: Path, dst: Path, chunk_size: int = default_chunk_size) -> int:
+    """
+    Copies the file with the large sequential reads, the dst is written atomically.
+
+    Args:
+        src (Path): The source file.
+        dst (Path): The destination file.
+        chunk_size (int, optional): The bytes of every read, defaults to 16 MB.
+
+    Returns:
+        int: The copied bytes.
+    """
+    n = 0
+    with atomic_path(dst) as tmp:
+        with open(src, "rb", buffering=0) as fi, open(tmp, "wb") as fo:
+            while True:
+                chunk = fi.read(chunk_size)
+                if not chunk:
+                    break
+                fo.write(chunk)
+                n += len(chunk)
+    return n
+
+
+class StagingArea(object):
+    """
+    The staged copies of the remote files on the local disk.
+
+    Attributes:
+        enabled (bool): Whether the files are staged, the files are read from the source if not.
+        store (CacheStore): The store of the staged files, it caps the disk usage.
+        chunk_size (int): The bytes of every read of the copy.
+    """
+
+    def __init__(
+        self,
+        root: Path = Path("cache", "stage"),
+        budget: int = default_stage_budget,
+        chunk_size: int = default_chunk_size,
+        enabled: bool = False,
+    ):
+        self.enabled = enabled
+        self.store = CacheStore(root, budget)
+        self.chunk_size = chunk_size
+
+    def _stage(self, path: Path, evt_path: Path = None) -> tuple:
+        """
+        Copies the files to the local disk unless the staged copies match the sources.
+        The entry should be pinned.
+
+        Returns:
+            Path: The staged data file.
+            Path | None: The staged evt.bdf.
+        """
+        path = Path(path)
+        unique = hashlib.md5(path.as_posix().encode()).hexdigest()
+        folder = self.store.touch(unique)
+
+        sources = {path.name: path}
+        if evt_path is not None and Path(evt_path).is_file():
+            sources[Path(evt_path).name] = Path(evt_path)
+        signatures = {name: _signature(src) for name, src in sources.items()}
+
+        meta_path = folder.joinpath("staged.json")
+        with FileLock(folder.joinpath("staged.lock")):
+            try:
+                meta = json.load(open(meta_path))
+            except (OSError, ValueError):
+                meta = {}
+
+            if (
+                meta.get("source") != path.as_posix()
+                or meta.get("signatures") != signatures
+            ):
+                n = sum(
+                    copy_in_chunks(src, folder.joinpath(name), self.chunk_size)
+                    for name, src in sources.items()
+                )
+                with atomic_path(meta_path) as tmp:
+                    with open(tmp, "w") as f:
+                        json.dump(
+                            dict(source=path.as_posix(), signatures=signatures), f
+                        )
+                self.store.update_size(unique)
+                logger.debug(f"Staged {path}, {n} bytes into {folder}")
+
+        staged_evt = folder.joinpath(Path(evt_path).name) if len(sources) > 1 else None
+        return folder.joinpath(path.name), staged_evt
+
+    @contextlib.contextmanager
+    def staged(self, path: Path, evt_path: Path = None):
+        """
+        Yields the local paths of the data file and its evt.bdf, they are pinned until exit.
+        The source paths are yielded if the staging is not enabled.
+
+        Args:
+            path (Path): The data file.
+            evt_path (Path, optional): The evt.bdf of the data file.
+
+        Yields:
+            tuple: (the data file, the evt.bdf) to read.
+        """
+        if not self.enabled:
+            yield Path(path), evt_path
+            return
+
+        unique = hashlib.md5(Path(path).as_posix().encode()).hexdigest()
+        token = self.store.pin(unique)
+        try:
+            yield self._stage(path, evt_path)
+        finally:
+            self.store.unpin(token)
+
+    def pin_staged(self, path: Path, evt_path: Path = None) -> str:
+        """
+        Stages the files and keeps them pinned until unpinned with the token,
+        like the files staged ahead of the following loads.
+
+        Args:
+            path (Path): The data file.
+            evt_path (Path, optional): The evt.bdf of the data file.
+
+        Returns:
+            str | None: The token of the pin, or None if the staging is not enabled.
+        """
+        if not self.enabled:
+            return None
+
+        unique = hashlib.md5(Path(path).as_posix().encode()).hexdigest()
+        token = self.store.pin(unique)
+        try:
+            self._stage(path, evt_path)
+        except Exception:
+            self.store.unpin(token)
+            raise
+        return token
+
+    def unpin(self, token: str):
+        if token is not None:
+            self.store.unpin(token)
+
+
+# The staging area shared by the process
+staging = StagingArea()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
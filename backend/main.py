@@ -18,14 +18,65 @@ Functions:
 # %% ---- 2024-02-21 ------------------------
 # Requirements and constants
 from pathlib import Path
+from functools import partial
 from omegaconf import OmegaConf
 
+from data import logger
 from data.search_data import RawDataFiles
 from data.load_raw_data import LoadRawData
+from data.pipeline import stream_load
+from data.cache_store import cache_store
+from data.stage_files import staging
+from data.render_figures import figure_queue
+from data.cache_data import signal_info_name
+from util.prefetch import Prefetch, read_files, file_paths
+
+# The pins of the files staged ahead, they are kept until the files are loaded, {id(file_info): token}
+staged_pins = {}
 
 
 # %% ---- 2024-02-21 ------------------------
 # Function and class
+def fetch(file_info: dict) -> int:
+    """
+    Fetches the file ahead of loading, it is staged and pinned if the staging is enabled, or read into the page cache.
+    The file is skipped if its signals are cached, since it is not read again.
+
+    Args:
+        file_info (dict): The file info.
+
+    Returns:
+        int: The bytes fetched.
+    """
+    if cache_store.path_of(file_info["unique"]).joinpath(signal_info_name).is_file():
+        return 0
+
+    if staging.enabled:
+        # The staged files are not evicted before loaded, see release
+        path = Path(file_info["path"])
+        staged_pins[id(file_info)] = staging.pin_staged(
+            path, path.parent.joinpath("evt.bdf")
+        )
+        return sum(e.stat().st_size for e in file_paths(file_info))
+
+    return read_files(file_info)
+
+
+def release(files: Prefetch, file_info: dict):
+    """
+    Releases the file when it is loaded, its fetch is finished and its staged files are unpinned.
+    """
+    files.release(file_info)
+    staging.unpin(staged_pins.pop(id(file_info), None))
+
+
+def load_signals(file_info: dict) -> LoadRawData:
+    """
+    Loads the file and decodes its signals into the signal store of the cache.
+    """
+    lrd = LoadRawData(file_info)
+    lrd.load_data()
+    return lrd
 
 
 # %% ---- 2024-02-21 ------------------------
@@ -35,9 +86,42 @@ if __name__ == "__main__":
     conf = OmegaConf.load(backend_root.joinpath("conf/default.yaml"))
     print(conf)
 
+    cache_store.budget = int(conf.cache_budget_gb * 1024**3)
+    staging.enabled = conf.stage_files
+    staging.store.budget = int(conf.stage_budget_gb * 1024**3)
+    figure_queue.max_workers = conf.render_workers
+
     rdf = RawDataFiles(conf.data_folder)
-    for e in rdf.find_all():
-        lrd = LoadRawData(e)
+
+    # The files are loaded while they are being found,
+    # the signals are only decoded into the cache if required,
+    # and then the next files are fetched while the current ones are being loaded
+    files = rdf.find_all(stream=True)
+    load = LoadRawData
+    on_done = None
+    if conf.cache_signals:
+        load = load_signals
+        # The files are released when they are loaded, not when they are queued
+        files = Prefetch(
+            files,
+            fetch=fetch,
+            read_ahead=conf.prefetch_files,
+            memory_cap=int(conf.prefetch_memory_gb * 1024**3),
+            auto_release=False,
+        )
+        on_done = partial(release, files)
+
+    for e, lrd, error in stream_load(
+        files,
+        load=load,
+        n_workers=conf.load_workers,
+        queue_size=conf.queue_size,
+        on_done=on_done,
+    ):
+        logger.info(f"Loaded: {e['path']}, {'failed' if error else 'passed'}")
+
+    # Wait for the figures in the queue
+    figure_queue.shutdown(wait=True)
 
 # %% ---- 2024-02-21 ------------------------
 # Pending
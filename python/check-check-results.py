@@ -18,9 +18,8 @@ Functions:
 
 # %% ---- 2024-04-23 ------------------------
 # Requirements and constants
-import pandas as pd
-
-from util import logger, cache_path
+from util import logger
+from util.catalog import Catalog
 
 
 # %% ---- 2024-04-23 ------------------------
@@ -30,18 +29,13 @@ from util import logger, cache_path
 # %% ---- 2024-04-23 ------------------------
 # Play ground
 if __name__ == '__main__':
-    found_files = pd.read_pickle(cache_path.joinpath('found_files'))
-    check_results = pd.read_pickle(cache_path.joinpath('check_results'))
-
-    print(found_files)
-    print(check_results)
+    catalog = Catalog()
 
-    df = pd.merge(check_results, found_files, on='path')
+    df = catalog.query()
     print(df)
 
-    group = df.groupby(['status', 'protocol', 'format'])
-    group = group[['path']]
-    print(group.count())
+    count = catalog.summary().set_index(['status', 'protocol', 'format'])
+    print(count)
 
 
 # %% ---- 2024-04-23 ------------------------
@@ -18,8 +18,10 @@ Functions:
 
 # %% ---- 2024-04-23 ------------------------
 # Requirements and constants
+import sys
 import json
 import time
+import argparse
 import pandas as pd
 
 from pathlib import Path
@@ -27,46 +29,156 @@ from datetime import datetime
 from tqdm.auto import tqdm
 
 from util import logger, cache_path
-from util.find_files import find_files, format_check
+from util.find_files import find_files_incremental, format_check, get_rule_version, as_categoricals
+from util.check_cache import CheckCache, file_fingerprint
+from util.check_pool import parallel_format_check
+from util.catalog import Catalog
+from util.quick_scan import quick_scan, estimate_rates
+from util.work_queue import coordinate, run_worker
 
 
 # %% ---- 2024-04-23 ------------------------
 # Function and class
+def parse_args():
+    parser = argparse.ArgumentParser(description='Format check for the known data folders')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=0,
+        help='The number of the worker processes, 0 refers checking in the main process')
+    parser.add_argument(
+        '-t', '--timeout', type=float, default=600,
+        help='The seconds allowed for checking one file in the worker process')
+    parser.add_argument(
+        '--header-only', action='store_true',
+        help='Only read the headers and the annotations, without the signal samples')
+    parser.add_argument(
+        '--fail-fast', action='store_true',
+        help='Run the cheapest rules first, and stop at the first failure')
+    parser.add_argument(
+        '-q', '--quick', type=float, default=0,
+        help='Check a stratified random sample within the seconds, and estimate the rates of the statuses')
+    parser.add_argument(
+        '--queue', type=Path, default=None,
+        help='Coordinate the checks through the work queue in the folder on the shared filesystem, the --workers local workers are started')
+    parser.add_argument(
+        '--worker', type=Path, default=None,
+        help='Run as the worker of the work queue in the folder, until the coordinator closes it')
+    return parser.parse_args()
 
 
 # %% ---- 2024-04-23 ------------------------
 # Play ground
 if __name__ == '__main__':
+    args = parse_args()
+
+    # The worker of the work queue only checks the files put by the coordinator
+    if args.worker is not None:
+        run_worker(args.worker, timeout=args.timeout)
+        sys.exit(0)
+
+    # The data folders and their concurrency of walking,
+    # the network share prefers more workers than the local disk.
     folders = [
-        Path('D://脑机接口专项')
+        (Path('D://脑机接口专项'), 8)
     ]
 
     tic = time.time()
 
     # --------------------
     dfs = []
-    for folder in tqdm(folders, 'Searching for files'):
+    for folder, max_workers in tqdm(folders, 'Searching for files'):
         # found_files = find_files(folder, limit=20)
-        found_files = find_files(folder)
+        found_files, delta = find_files_incremental(folder, max_workers=max_workers)
         dfs.append(found_files)
         logger.info(f'Checked folder: {folder}, for {len(found_files)} files')
+        logger.info(
+            f'Changes since last scan: {folder}, ' +
+            ', '.join(f'{k}: {len(v)}' for k, v in delta.items()))
 
     # --------------------
-    found_files = pd.concat(dfs, axis=0)
+    found_files = as_categoricals(pd.concat(dfs, axis=0))
     found_files.index = range(len(found_files))
     logger.info(f'Found files:\n{found_files}')
 
     # --------------------
-    buffer = []
-    for i, row in tqdm(found_files.iterrows(), 'Format checking'):
-        output = format_check(row)
-        buffer.append(output)
-        # print(output)
-    check_results = pd.DataFrame(buffer)
+    # Estimate the rates from the sample, instead of checking all the files.
+    # The header-only checks are the same as the full checks, but much faster.
+    if args.quick > 0:
+        sampled = quick_scan(
+            found_files, budget=args.quick, header_only=True, fail_fast=args.fail_fast)
+        estimates = estimate_rates(found_files, sampled)
+        print(estimates)
+        logger.info(f'Quick scan estimates:\n{estimates}')
+        sys.exit(0)
+
+    # --------------------
+    # The found files are synced into the catalog,
+    # and the check results are written into it as soon as they are known
+    catalog = Catalog()
+    catalog.sync_files(found_files)
+    catalog.index_channels()
+    catalog.index_events()
+
+    # --------------------
+    # Reuse the cached check results of the unchanged files with unchanged rules
+    check_cache = CheckCache(cache_path.joinpath('check_cache'))
+    rows = [row for i, row in found_files.iterrows()]
+    fingerprints = [file_fingerprint(row) for row in tqdm(rows, 'Fingerprinting')]
+    # The fail-fast results are partial, they are not reused by the full checks
+    versions = [(get_rule_version(row['protocol']), args.fail_fast) for row in rows]
+    buffer = [check_cache.get(f, v) for f, v in zip(fingerprints, versions)]
+
+    # The copies of the same recording are checked only once,
+    # the canonical copy is checked and the others share its output
+    index = {row['path']: i for i, row in enumerate(rows)}
+    canonical = [index[row['canonical']] for row in rows]
+    todo = [i for i, e in enumerate(buffer) if e is None and canonical[i] == i]
+    logger.info(
+        f'Reused {len(rows) - len(todo)} cached check results or copies, checking {len(todo)} files')
+    catalog.put_results([e for e in buffer if e is not None])
+
+    def _finished(j, output):
+        # The output is appended to the cache and the catalog as soon as it is finished
+        i = todo[j]
+        buffer[i] = output
+        check_cache.put(fingerprints[i], versions[i], output)
+        catalog.put_result(output)
 
     # --------------------
-    found_files.to_pickle(cache_path.joinpath('found_files'))
-    check_results.to_pickle(cache_path.joinpath('check_results'))
+    if args.queue is not None:
+        coordinate(
+            args.queue,
+            [rows[i] for i in todo],
+            n_workers=args.workers,
+            timeout=args.timeout,
+            callback=_finished,
+            header_only=args.header_only,
+            fail_fast=args.fail_fast)
+    elif args.workers > 0:
+        parallel_format_check(
+            [rows[i] for i in todo],
+            n_workers=args.workers,
+            timeout=args.timeout,
+            callback=_finished,
+            header_only=args.header_only,
+            fail_fast=args.fail_fast)
+    else:
+        for j, i in enumerate(tqdm(todo, 'Format checking')):
+            output = format_check(
+                rows[i], header_only=args.header_only, fail_fast=args.fail_fast)
+            _finished(j, output)
+            # print(output)
+
+    # Share the outputs with the copies
+    copies = []
+    for i, j in enumerate(canonical):
+        if buffer[i] is None:
+            buffer[i] = dict(buffer[j], path=rows[i]['path'])
+            check_cache.put(fingerprints[i], versions[i], buffer[i])
+            copies.append(buffer[i])
+    catalog.put_results(copies)
+
+    check_cache.compact(keep=found_files['path'])
+    catalog.close()
 
     passed = time.time() - tic
     checks_info = dict(
@@ -123,7 +123,7 @@ class BaseProtocolWindow(BaseWindow):
         n = len(self.chosen_files)
         self.listWidget_chosenFiles.addItems(
             [
-                f"{i + 1} | {n}: {e['path'].as_posix()}"
+                f"{i + 1} | {n}: {Path(e['path']).as_posix()}"
                 for i, e in enumerate(self.chosen_files)
             ]
         )
@@ -19,27 +19,28 @@ Functions:
 # %% ---- 2024-04-25 ------------------------
 # Requirements and constants
 import pandas as pd
+from pathlib import Path
+from PySide6 import QtCore
 from PySide6.QtUiTools import QUiLoader
 
 from .base_window import BaseWindow
 from .custom_table_model import CustomTableModel
 from .window_of_MI import MIWindow
-from . import logger, project_root, cache_path
+from . import logger, project_root
+from util.catalog import Catalog
+from util.find_files import as_categoricals
+from util.scanner_daemon import DeltaSubscriber
 
 # --------------------
 loader = QUiLoader()
+catalog = Catalog()
 
 # %% ---- 2024-04-25 ------------------------
 # Function and class
 
 
-def load_files_table(map):
-    found_files = pd.read_pickle(cache_path.joinpath('found_files'))
-    check_results = pd.read_pickle(cache_path.joinpath('check_results'))
-
-    df = pd.merge(check_results, found_files, on='path')
-    df = df[df.apply(map, axis=1)]
-
+def load_files_table(where: str, params: tuple = ()):
+    df = catalog.query(where, params)
     logger.debug(f'Loaded files: {len(df)}')
 
     return df
@@ -71,8 +72,8 @@ class DataSelectionWindow(BaseWindow):
 
     # --------------------
     # The table of found files
-    files_table = load_files_table(lambda se: se['status'] != 'failed')
-    failed_files_table = load_files_table(lambda se: se['status'] == 'failed')
+    files_table = load_files_table('status != ?', ('failed',))
+    failed_files_table = load_files_table('status = ?', ('failed',))
 
     # --------------------
     # variables
@@ -87,6 +88,58 @@ class DataSelectionWindow(BaseWindow):
         self.setup_protocols()
         self.update_protocolSummary()
         self.handle_goToNext_events()
+        self.subscribe_scanner_daemon()
+
+    def subscribe_scanner_daemon(self, interval: int = 1000):
+        """
+        Subscribes the deltas of the scanner daemon, they are applied every interval milliseconds in the GUI thread.
+
+        Args:
+            interval (int, optional): The milliseconds between the polls, defaults to 1000.
+        """
+
+        self.subscriber = DeltaSubscriber().start()
+        self.delta_timer = QtCore.QTimer(self.window)
+        self.delta_timer.timeout.connect(
+            lambda: [self.apply_delta(e) for e in self.subscriber.poll()])
+        self.delta_timer.start(interval)
+
+    def apply_delta(self, delta: dict):
+        """
+        Applies the delta of the catalog to the tables in place, the chosen files are kept.
+
+        Args:
+            delta (dict): dict(upserted=pd.DataFrame of the changed files, removed=[paths]).
+        """
+
+        upserted = delta['upserted']
+        paths = set(delta['removed']) | set(upserted['path'])
+
+        df = pd.concat([self.files_table, self.failed_files_table], axis=0)
+        df = df[~df['path'].isin(paths)]
+        df = as_categoricals(pd.concat([df, upserted], axis=0))
+        df = df.sort_values('path')
+        df.index = range(len(df))
+
+        failed = df['status'] == 'failed'
+        self.files_table = df[~failed]
+        self.failed_files_table = df[failed]
+        logger.debug(
+            f'Applied delta: upserted {len(upserted)}, removed {len(delta["removed"])}')
+
+        known = {self.comboBox_protocolSelection.itemText(i)
+                 for i in range(self.comboBox_protocolSelection.count())}
+        for protocol in sorted(set(self.files_table['protocol'].to_list()) - known):
+            self.comboBox_protocolSelection.addItem(protocol)
+
+        # The chosen files removed or failed are discarded
+        valid = set(self.files_table['path'])
+        self.chosen_files = [e for e in self.chosen_files if e['path'] in valid]
+        self.update_listWidget_chosenFiles()
+        self.update_protocolSummary()
+        self.refresh_failed_files_with_current_protocol()
+        # Re-filter the files table with the current text
+        self.lineEdit_pathFilter.textChanged.emit(self.lineEdit_pathFilter.text())
 
     def handle_goToNext_events(self):
 
@@ -105,7 +158,7 @@ class DataSelectionWindow(BaseWindow):
 
     def update_protocolSummary(self):
         df = pd.concat([self.files_table, self.failed_files_table], axis=0)
-        group = df.groupby(['status', 'protocol', 'format'])
+        group = df.groupby(['status', 'protocol', 'format'], observed=True)
         group = group[['path']]
         count = group.count()
 
@@ -212,7 +265,7 @@ class DataSelectionWindow(BaseWindow):
 
         def _select_failed_file():
             idx = self.listWidget_failedFiles.currentRow()
-            file = files[idx]
+            file = dict(files[idx]) | catalog.details(files[idx]['path'])
             text = '\n'.join(f'{k}: \t{v}' for k, v in file.items())
             self.textBrowser_failedFiles.setText(text)
 
@@ -303,7 +356,8 @@ class DataSelectionWindow(BaseWindow):
         self.candidate_file = file
         text = ''
         if file is not None:
-            text = '\n'.join(f'{k}: \t{v}' for k, v in file.items())
+            details = catalog.details(file['path'])
+            text = '\n'.join(f'{k}: \t{v}' for k, v in (file | details).items())
         self.textBrowser_candidateFileDetail.setText(text)
         logger.debug(f'Changed candidate file: {file}')
 
@@ -324,7 +378,7 @@ class DataSelectionWindow(BaseWindow):
         self.listWidget_chosenFiles.clear()
         self.listWidget_chosenFiles.addItems(
             [
-                f"{i + 1}: {e['path'].as_posix()}"
+                f"{i + 1}: {Path(e['path']).as_posix()}"
                 for i, e in enumerate(self.chosen_files)
             ]
         )
@@ -0,0 +1,79 @@
+"""
+File: scanner-daemon.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The resident scanner of the known data folders.
+
+    The new or changed files are checked as soon as they are found,
+    and the deltas are pushed to the open DataSelectionWindow.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import argparse
+
+from pathlib import Path
+
+from util.scanner_daemon import ScannerDaemon, default_address
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def parse_args():
+    parser = argparse.ArgumentParser(description='Resident scanner of the known data folders')
+    parser.add_argument(
+        '-i', '--interval', type=float, default=60,
+        help='The seconds between the scans')
+    parser.add_argument(
+        '-p', '--port', type=int, default=default_address[1],
+        help='The local port the windows subscribe to')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=None,
+        help='The number of the format check processes, defaults to the cpu count')
+    parser.add_argument(
+        '-t', '--timeout', type=float, default=600,
+        help='The seconds allowed for checking one file')
+    parser.add_argument(
+        '--header-only', action='store_true',
+        help='Only read the headers and the annotations, without the signal samples')
+    return parser.parse_args()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+if __name__ == '__main__':
+    args = parse_args()
+
+    # The data folders and their concurrency of walking,
+    # the network share prefers more workers than the local disk.
+    folders = [
+        (Path('D://脑机接口专项'), 8)
+    ]
+
+    daemon = ScannerDaemon(
+        folders,
+        interval=args.interval,
+        address=(default_address[0], args.port),
+        n_workers=args.workers,
+        timeout=args.timeout,
+        header_only=args.header_only)
+    daemon.run()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
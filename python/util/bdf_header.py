@@ -0,0 +1,374 @@
+"""
+File: bdf_header.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Read the fixed-size header of the BDF file,
+    and the TAL annotations of the evt.bdf file,
+    without touching the signal samples.
+
+    The check_structure compares the headers with the file sizes,
+    the truncated or half-copied files are found before the expensive loading.
+
+    The HeaderRaw works as the raw for the format checks,
+    it has the info['ch_names'], info['sfreq'] and the events,
+    which are the same as the mne.io.read_raw + mne.read_annotations does.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import re
+import numpy as np
+
+from pathlib import Path
+from datetime import datetime
+
+from . import logger
+
+# The names of the annotation channels, they are not signals
+tal_ch_names = ['EDF Annotations', 'BDF Annotations']
+
+# The names of the stim channels, they are not counted for the sfreq
+stim_ch_names = ['STATUS', 'TRIGGER']
+
+# The TAL pattern, the same as mne uses
+tal_pattern = '([+-]\\d+\\.?\\d*)(\x15(\\d+\\.?\\d*))?(\x14.*?)\x14\x00'
+
+# The descriptions of the events, the BAD and EDGE annotations are not,
+# the same as the default regexp of mne.events_from_annotations
+event_pattern = '^(?![Bb][Aa][Dd]|[Ee][Dd][Gg][Ee]).*$'
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _unique_ch_names(ch_names: list) -> list:
+    """
+    Makes the channel names unique, the duplicated names are suffixed with -0, -1, ...
+    """
+    output = list(ch_names)
+    for name in set(ch_names):
+        idx = [i for i, e in enumerate(ch_names) if e == name]
+        if len(idx) > 1:
+            for j, i in enumerate(idx):
+                output[i] = f'{name}-{j}'
+    return output
+
+
+class BDFHeader(object):
+    """
+    The header of the BDF (or EDF) file.
+
+    Attributes:
+        path (Path): The path of the file.
+        file_size (int): The bytes of the file.
+        header_bytes (int): The bytes of the header.
+        n_records_header (int): The number of the data records written in the header, -1 refers unknown.
+        record_duration (float): The seconds of a data record.
+        labels (list): The labels of all the channels.
+        units (list): The physical dimensions of all the channels.
+        physical_min, physical_max, digital_min, digital_max (np.ndarray): The calibrations of all the channels.
+        samples_per_record (np.ndarray): The number of samples in a data record of all the channels.
+        meas_date (datetime): The start date and time of the recording, None if invalid.
+        sample_bytes (int): 3 for BDF and 2 for EDF.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._read()
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            fixed = f.read(256)
+            if len(fixed) < 256:
+                raise ValueError(
+                    f'Invalid header, the file has only {len(fixed)} bytes: {self.path}')
+
+            self.sample_bytes = 3 if fixed[:8] == b'\xffBIOSEMI' else 2
+
+            def _field(a, b):
+                return fixed[a:b].decode('latin-1').strip()
+
+            self.header_bytes = int(_field(184, 192))
+            self.n_records_header = int(_field(236, 244))
+            self.record_duration = float(_field(244, 252))
+            n = int(_field(252, 256))
+            self.n_channels = n
+
+            try:
+                day, month, year = (int(e) for e in _field(168, 176).split('.'))
+                hour, minute, second = (int(e) for e in _field(176, 184).split('.'))
+                year += 2000 if year < 85 else 1900
+                self.meas_date = datetime(year, month, day, hour, minute, second)
+            except ValueError:
+                self.meas_date = None
+
+            channels = f.read(256 * n)
+            if len(channels) < 256 * n:
+                raise ValueError(
+                    f'Invalid header, the channels header is truncated: {self.path}')
+
+            self.file_size = f.seek(0, 2)
+
+        def _fields(offset, width):
+            start = offset * n
+            return [
+                channels[start + i * width: start + (i + 1) * width].decode('latin-1').strip()
+                for i in range(n)
+            ]
+
+        self.labels = _fields(0, 16)
+        self.units = _fields(16 + 80, 8)
+        self.physical_min = np.array(_fields(16 + 80 + 8, 8), dtype=float)
+        self.physical_max = np.array(_fields(16 + 80 + 16, 8), dtype=float)
+        self.digital_min = np.array(_fields(16 + 80 + 24, 8), dtype=float)
+        self.digital_max = np.array(_fields(16 + 80 + 32, 8), dtype=float)
+        self.samples_per_record = np.array(
+            _fields(16 + 80 + 40 + 80, 8), dtype=int)
+
+    @property
+    def tal_idx(self) -> list:
+        return [i for i, e in enumerate(self.labels) if e in tal_ch_names]
+
+    @property
+    def signal_idx(self) -> list:
+        return [i for i, e in enumerate(self.labels) if e not in tal_ch_names]
+
+    @property
+    def ch_names(self) -> list:
+        """
+        The names of the signal channels, the same as the raw.info['ch_names'].
+        """
+        return _unique_ch_names([self.labels[i] for i in self.signal_idx])
+
+    @property
+    def record_bytes(self) -> int:
+        return int(np.sum(self.samples_per_record)) * self.sample_bytes
+
+    @property
+    def n_records(self) -> int:
+        """
+        The number of the data records in the file, inferred from the file size.
+        """
+        return (self.file_size - self.header_bytes) // max(self.record_bytes, 1)
+
+    @property
+    def sfreq(self) -> float:
+        """
+        The sampling frequency, the maximum of the signal channels except for the stim channels.
+        """
+        idx = [
+            i for i in self.signal_idx
+            if self.labels[i].upper() not in stim_ch_names]
+        if len(idx) == 0:
+            idx = self.signal_idx
+        duration = self.record_duration if self.record_duration > 0 else 1.0
+        return float(np.max(self.samples_per_record[idx]) / duration)
+
+    @property
+    def n_times(self) -> int:
+        idx = self.signal_idx
+        return int(self.n_records * np.max(self.samples_per_record[idx]))
+
+
+def _structure_problems(path: Path, name: str, annotations: bool = False) -> list:
+    """
+    Compares the header of the BDF (or EDF) file with its actual size.
+
+    Args:
+        path (Path): The path of the file.
+        name (str): The name of the file in the messages, like data.bdf.
+        annotations (bool, optional): The file must have the annotations channel, defaults to False.
+
+    Returns:
+        list: The problems, the empty list refers the structure is fine.
+    """
+    try:
+        header = BDFHeader(path)
+    except OSError as err:
+        return [f'The {name} is not readable: {err}']
+    except ValueError as err:
+        return [f'The {name} has invalid header: {err}']
+
+    problems = []
+
+    if annotations and not header.tal_idx:
+        problems.append(
+            f'The {name} has no annotations channel, the channels are {header.labels}')
+
+    n = header.n_channels
+    if header.header_bytes != 256 * (n + 1):
+        problems.append(
+            f'The {name} header bytes should be {256 * (n + 1)} for {n} channels, but the value is {header.header_bytes}')
+
+    # The annotations-only file (like the evt.bdf) has zero record duration
+    if header.record_duration <= 0 and header.signal_idx:
+        problems.append(
+            f'The {name} record duration should be positive, but the value is {header.record_duration}')
+
+    if np.any(header.samples_per_record <= 0):
+        problems.append(
+            f'The {name} samples per record should be positive, but the values are {header.samples_per_record.tolist()}')
+
+    if problems:
+        return problems
+
+    data_bytes = header.file_size - header.header_bytes
+    record_bytes = header.record_bytes
+
+    if data_bytes < record_bytes:
+        problems.append(
+            f'The {name} has no complete data record, {data_bytes} bytes after the header, but a record has {record_bytes} bytes')
+
+    elif data_bytes % record_bytes != 0:
+        problems.append(
+            f'The {name} is truncated, the last record has {data_bytes % record_bytes} of {record_bytes} bytes')
+
+    if header.n_records_header > 0 and header.n_records_header != data_bytes // record_bytes:
+        problems.append(
+            f'The {name} header has {header.n_records_header} records, but the file size ({header.file_size} bytes) has {data_bytes / record_bytes:.2f} records')
+
+    return problems
+
+
+def check_structure(path: Path, evt_path: Path = None) -> list:
+    """
+    Checks the structure of the data.bdf and its evt.bdf in milliseconds,
+    only the headers are read and compared with the file sizes.
+
+    Args:
+        path (Path): The path of the data.bdf.
+        evt_path (Path, optional): The path of the evt.bdf, None refers it is missing.
+
+    Returns:
+        list: The problems, the empty list refers the files are fine to load.
+    """
+    problems = _structure_problems(path, 'data.bdf')
+
+    if not isinstance(evt_path, (str, Path)) or not Path(evt_path).is_file():
+        problems.append(f'The evt.bdf is missing: {Path(path).parent}')
+    else:
+        problems.extend(_structure_problems(evt_path, 'evt.bdf', annotations=True))
+
+    return problems
+
+
+def read_tal_annotations(path: Path, encoding: str = 'utf8'):
+    """
+    Reads the TAL annotations of the BDF (or EDF) file, the same as mne.read_annotations does.
+
+    Args:
+        path (Path): The path of the file, usually the evt.bdf.
+        encoding (str, optional): The encoding of the annotations, defaults to 'utf8'.
+
+    Returns:
+        np.ndarray: The onsets in seconds.
+        np.ndarray: The durations in seconds.
+        list: The descriptions.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    triggers = re.findall(tal_pattern.encode(), content)
+    triggers = [tuple(e.decode(encoding) for e in t) for t in triggers]
+
+    onsets = []
+    durations = []
+    descriptions = []
+    offset = 0.0
+    for k, ev in enumerate(triggers):
+        onset = float(ev[0]) + offset
+        duration = float(ev[2]) if ev[2] else 0
+        for description in ev[3].split('\x14')[1:]:
+            if description:
+                onsets.append(onset)
+                durations.append(duration)
+                descriptions.append(description)
+            elif k == 0:
+                # The time-keeping TAL of the first record
+                offset = -onset
+
+    # The annotations are sorted by onsets
+    onsets = np.array(onsets, dtype=float)
+    order = np.argsort(onsets, kind='stable')
+    return (
+        onsets[order],
+        np.array(durations, dtype=float)[order],
+        [descriptions[i] for i in order])
+
+
+class HeaderRaw(object):
+    """
+    The header-only stand-in of the raw for the format checks.
+
+    Attributes:
+        header (BDFHeader): The header of the data.bdf.
+        info (dict): The dict(ch_names, sfreq).
+        n_times (int): The number of the samples.
+        onsets, durations, descriptions: The annotations within the data range.
+    """
+
+    def __init__(self, path: Path, evt_path: Path):
+        self.header = BDFHeader(path)
+        self.info = dict(
+            ch_names=self.header.ch_names,
+            sfreq=self.header.sfreq)
+        self.n_times = self.header.n_times
+
+        onsets, durations, descriptions = read_tal_annotations(evt_path)
+
+        # Drop the annotations outside the data range,
+        # the same as raw.set_annotations does
+        sfreq = self.info['sfreq']
+        end = self.n_times / sfreq
+        keep = (onsets <= end) & (onsets + durations >= 0)
+        self.onsets = np.maximum(onsets[keep], 0)
+        self.durations = durations[keep]
+        self.descriptions = [e for e, k in zip(descriptions, keep) if k]
+
+        logger.debug(
+            f'Read header: {path}, {len(self.info["ch_names"])} channels, {sfreq} Hz, {len(self.onsets)} annotations')
+
+    def events_from_annotations(self):
+        """
+        Converts the annotations into the events, the same as mne.events_from_annotations does,
+        the BAD and EDGE annotations are dropped, see event_pattern.
+
+        Returns:
+            np.ndarray: The events array of (n, 3).
+            dict: The event_id.
+        """
+        regexp = re.compile(event_pattern)
+        keep = [regexp.match(e) is not None for e in self.descriptions]
+        descriptions = [e for e, k in zip(self.descriptions, keep) if k]
+
+        event_id = {e: i + 1 for i, e in enumerate(sorted(set(descriptions)))}
+        if len(descriptions) == 0:
+            # The same error as mne raises
+            raise ValueError('Could not find any of the events you specified.')
+
+        inds = np.round(self.onsets[keep] * self.info['sfreq']).astype(int)
+        values = np.array([event_id[e] for e in descriptions], dtype=int)
+        events = np.c_[inds, np.zeros(len(inds)), values].astype(int)
+        return events, event_id
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,345 @@
+"""
+File: bdf_reader.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Read the selected channels of the BDF file.
+
+    The data records are memory-mapped, and only the byte ranges of the selected channels are touched,
+    so the I/O and CPU cost scale with the number of the selected channels.
+    The 24-bit samples are decoded in bulk with the numpy operations,
+    and the channels are decoded in the threads for the wide selections.
+    The output is the mne.io.RawArray, it drops into the loaders of the mne.io.read_raw.
+
+    The read_epochs_bdf only reads the data records overlapping the epoch windows,
+    so the sparse trials of a long recording cost a small part of the file.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import mne
+import numpy as np
+
+from pathlib import Path
+from datetime import timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger
+from .bdf_header import BDFHeader, stim_ch_names, _unique_ch_names
+
+# The scales of the physical dimensions to Volts, the same as the mne uses
+unit_scales = {'V': 1.0, 'mV': 1e-3, 'uV': 1e-6, 'µV': 1e-6, 'nV': 1e-9}
+
+# The channels are decoded in the threads if more than it are selected
+default_thread_threshold = 8
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def decode_int24(buffer: np.ndarray) -> np.ndarray:
+    """
+    Decodes the little-endian signed 24-bit samples.
+
+    Args:
+        buffer (np.ndarray): The uint8 array of (..., 3 * n), the last axis is the bytes of the samples.
+
+    Returns:
+        np.ndarray: The int32 array of (..., n).
+    """
+    b = buffer.reshape(buffer.shape[:-1] + (-1, 3))
+    # The signed high byte extends the sign, the lower bytes are shifted in place
+    output = b[..., 2].view(np.int8).astype(np.int32)
+    output <<= 8
+    output |= b[..., 1]
+    output <<= 8
+    output |= b[..., 0]
+    return output
+
+
+def decode_int16(buffer: np.ndarray) -> np.ndarray:
+    """
+    Decodes the little-endian signed 16-bit samples of the EDF.
+    """
+    return np.ascontiguousarray(buffer).view('<i2').astype(np.int32)
+
+
+class BDFReader(object):
+    """
+    The reader of the selected channels of the BDF (or EDF) file.
+
+    Attributes:
+        header (BDFHeader): The header of the file.
+        offsets (np.ndarray): The byte offsets of all the channels within a data record.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.header = BDFHeader(path)
+        h = self.header
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(h.samples_per_record)[:-1]]) * h.sample_bytes
+
+    def pick_idx(self, picks: list = None) -> list:
+        """
+        Returns the indexes of the picked channels in the header, in the order of the picks.
+
+        Args:
+            picks (list, optional): The channel names, case insensitive, defaults to all the signal channels.
+
+        Returns:
+            list: The indexes of the channels.
+        """
+        h = self.header
+        signal_idx = h.signal_idx
+        if picks is None:
+            return signal_idx
+
+        names = {e.upper(): i for e, i in zip(h.ch_names, signal_idx)}
+        missing = [e for e in picks if e.upper() not in names]
+        if missing:
+            raise ValueError(f'Channels not found: {missing} in {self.path}')
+        return [names[e.upper()] for e in picks]
+
+    def is_plain(self, idx: list) -> bool:
+        """
+        Whether the channels are decoded directly,
+        the stim channels and the channels of lower rates are left for the mne.
+        """
+        h = self.header
+        top = np.max(h.samples_per_record[h.signal_idx])
+        return all(
+            h.samples_per_record[i] == top and h.labels[i].upper() not in stim_ch_names
+            for i in idx)
+
+    def read(self, idx: list, start_record: int = 0, stop_record: int = None, max_workers: int = 4, thread_threshold: int = default_thread_threshold) -> np.ndarray:
+        """
+        Reads and calibrates the channels within the data records.
+
+        Args:
+            idx (list): The indexes of the channels, they should be plain, see is_plain.
+            start_record (int, optional): The first data record, defaults to 0.
+            stop_record (int, optional): The data record after the last, defaults to all the complete ones.
+            max_workers (int, optional): The number of the decoding threads, defaults to 4.
+            thread_threshold (int, optional): The threads are used if more channels are selected, defaults to 8.
+
+        Returns:
+            np.ndarray: The data in Volts of (len(idx), n_samples).
+        """
+        h = self.header
+        n_records = h.n_records
+        stop_record = n_records if stop_record is None else min(stop_record, n_records)
+        n = max(stop_record - start_record, 0)
+        spr = int(np.max(h.samples_per_record[h.signal_idx]))
+        output = np.empty((len(idx), n * spr), dtype=np.float64)
+        if n == 0 or len(idx) == 0:
+            return output
+
+        records = np.memmap(
+            self.path, dtype=np.uint8, mode='r',
+            offset=h.header_bytes + start_record * h.record_bytes,
+            shape=(n, h.record_bytes))
+
+        decode = decode_int24 if h.sample_bytes == 3 else decode_int16
+
+        def _decode(k):
+            i = idx[k]
+            a = self.offsets[i]
+            b = a + spr * h.sample_bytes
+            # Only the byte ranges of the channel are touched
+            digital = decode(records[:, a:b]).reshape(-1)
+            cal = (h.physical_max[i] - h.physical_min[i]) / \
+                (h.digital_max[i] - h.digital_min[i])
+            offset = h.physical_min[i] - h.digital_min[i] * cal
+            scale = unit_scales.get(h.units[i], 1.0)
+            # Calibrate in place, without the temporary arrays
+            np.multiply(digital, cal * scale, out=output[k])
+            output[k] += offset * scale
+
+        if len(idx) > thread_threshold and max_workers > 1:
+            with ThreadPoolExecutor(max_workers) as executor:
+                list(executor.map(_decode, range(len(idx))))
+        else:
+            for k in range(len(idx)):
+                _decode(k)
+
+        return output
+
+    def read_samples(self, idx: list, start: int, stop: int, max_workers: int = 4) -> np.ndarray:
+        """
+        Reads and calibrates the channels within the samples, only the data records covering them are read.
+
+        Args:
+            idx (list): The indexes of the channels, they should be plain, see is_plain.
+            start (int): The first sample.
+            stop (int): The sample after the last.
+            max_workers (int, optional): The number of the decoding threads, defaults to 4.
+
+        Returns:
+            np.ndarray: The data in Volts of (len(idx), stop - start).
+        """
+        h = self.header
+        spr = int(np.max(h.samples_per_record[h.signal_idx]))
+        r0, r1 = start // spr, -(-stop // spr)
+        data = self.read(idx, r0, r1, max_workers=max_workers)
+        return data[:, start - r0 * spr:stop - r0 * spr]
+
+
+def read_raw_bdf(path: Path, evt_path: Path = None, picks: list = None, max_workers: int = 4) -> mne.io.BaseRaw:
+    """
+    Reads the raw of the selected channels, the drop-in of the mne.io.read_raw.
+
+    Args:
+        path (Path): The path of the BDF file.
+        evt_path (Path, optional): The evt.bdf, its annotations are set to the raw.
+        picks (list, optional): The channel names, case insensitive, defaults to all the signal channels.
+        max_workers (int, optional): The number of the decoding threads, defaults to 4.
+
+    Returns:
+        mne.io.BaseRaw: The raw with the data loaded.
+    """
+    reader = BDFReader(path)
+    h = reader.header
+    idx = reader.pick_idx(picks)
+    ch_names = _unique_ch_names([h.labels[i] for i in h.signal_idx])
+    names = [ch_names[h.signal_idx.index(i)] for i in idx]
+
+    if reader.is_plain(idx):
+        data = reader.read(idx, max_workers=max_workers)
+        info = mne.create_info(names, h.sfreq, 'eeg')
+        raw = mne.io.RawArray(data, info, verbose=False)
+        if h.meas_date is not None:
+            raw.set_meas_date(h.meas_date.replace(tzinfo=timezone.utc))
+        logger.debug(
+            f'Read {len(idx)} | {len(h.signal_idx)} channels of {path}, {data.shape[1]} samples')
+    else:
+        # The stim channels and the channels of lower rates are read by the mne
+        raw = mne.io.read_raw(path).pick(names).load_data()
+        logger.debug(f'Read {len(idx)} | {len(h.signal_idx)} channels of {path} with mne')
+
+    if evt_path is not None:
+        raw.set_annotations(mne.read_annotations(evt_path))
+
+    return raw
+
+
+def _merge_ranges(starts: np.ndarray, stops: np.ndarray) -> list:
+    """
+    Merges the overlapping or adjacent ranges.
+
+    Returns:
+        list: The (start, stop, members) of the merged ranges, the members are the indexes of the ranges.
+    """
+    output = []
+    for k in np.argsort(starts, kind='stable'):
+        if output and starts[k] <= output[-1][1]:
+            output[-1][1] = max(output[-1][1], stops[k])
+            output[-1][2].append(k)
+        else:
+            output.append([starts[k], stops[k], [k]])
+    return output
+
+
+def read_epochs_bdf(path: Path, events: np.ndarray, event_id: dict, tmin: float, tmax: float, picks: list = None, pad: float = 0.0, l_freq: float = None, h_freq: float = None, decim: int = 1, max_workers: int = 4, **kwargs) -> mne.EpochsArray:
+    """
+    Reads the epochs, only the data records overlapping the epoch windows are read.
+    The window is padded on both sides for the filter, and cropped after filtering.
+
+    Args:
+        path (Path): The path of the BDF file.
+        events (np.ndarray): The events array of (n, 3), like the LoadRawData.get_events.
+        event_id (dict): The event_id of the epochs, the events of other values are ignored.
+        tmin (float): The start of the epoch window in seconds.
+        tmax (float): The end of the epoch window in seconds.
+        picks (list, optional): The channel names, case insensitive, defaults to all the signal channels.
+        pad (float, optional): The seconds padded on both sides of the window for the filter, clipped by the data range, defaults to 0.0.
+        l_freq (float, optional): The low cut-off frequency of the band-pass filter, defaults to None.
+        h_freq (float, optional): The high cut-off frequency of the band-pass filter, defaults to None.
+        decim (int, optional): The decimation of the epochs, defaults to 1.
+        max_workers (int, optional): The number of the decoding threads, defaults to 4.
+        **kwargs: The keyword arguments of the mne.EpochsArray, like baseline and reject.
+
+    Returns:
+        mne.EpochsArray: The epochs.
+    """
+    reader = BDFReader(path)
+    h = reader.header
+    idx = reader.pick_idx(picks)
+    ch_names = _unique_ch_names([h.labels[i] for i in h.signal_idx])
+    names = [ch_names[h.signal_idx.index(i)] for i in idx]
+    sfreq = h.sfreq
+    spr = int(np.max(h.samples_per_record[h.signal_idx]))
+    n_times = h.n_records * spr
+
+    # The windows of the events, in samples
+    events = np.asarray(events).reshape(-1, 3)
+    events = events[np.isin(events[:, 2], list(event_id.values()))]
+    a, b = int(round(tmin * sfreq)), int(round(tmax * sfreq))
+    keep = (events[:, 0] + a >= 0) & (events[:, 0] + b + 1 <= n_times)
+    if not np.all(keep):
+        logger.warning(f'Dropped {np.sum(~keep)} events out of the data range: {path}')
+    events = events[keep]
+
+    # The windows are padded on both sides, the pads are clipped by the data range,
+    # and the crops are offset by the clipped pads
+    p = int(np.ceil(pad * sfreq))
+    starts = np.maximum(events[:, 0] + a - p, 0)
+    stops = np.minimum(events[:, 0] + b + p + 1, n_times)
+    offsets = events[:, 0] + a - starts
+
+    def _filter(x):
+        if l_freq is None and h_freq is None:
+            return x
+        return mne.filter.filter_data(x, sfreq, l_freq, h_freq, method='iir', verbose=False)
+
+    data = np.empty((len(events), len(idx), b - a + 1), dtype=np.float64)
+    if reader.is_plain(idx):
+        runs = _merge_ranges(starts // spr, -(-stops // spr))
+        for r0, r1, members in runs:
+            segment = reader.read(idx, r0, r1, max_workers=max_workers)
+            for k in members:
+                s = starts[k] - r0 * spr
+                o = offsets[k]
+                data[k] = _filter(segment[:, s:s + stops[k] - starts[k]])[:, o:o + b - a + 1]
+
+        n_records = sum(r1 - r0 for r0, r1, _ in runs)
+        logger.debug(
+            f'Read {n_records} | {h.n_records} records of {len(idx)} channels for {len(events)} epochs: {path}')
+    else:
+        # The stim channels and the channels of lower rates are read by the mne
+        raw = mne.io.read_raw(path).pick(names).load_data()
+        for k in range(len(events)):
+            x = raw.get_data(start=starts[k], stop=stops[k])
+            o = offsets[k]
+            data[k] = _filter(x)[:, o:o + b - a + 1]
+
+    info = mne.create_info(names, sfreq, 'eeg')
+    present = set(events[:, 2])
+    epochs = mne.EpochsArray(
+        data, info, events=events, tmin=a / sfreq,
+        event_id={k: v for k, v in event_id.items() if v in present},
+        verbose=False, **kwargs)
+    if decim > 1:
+        epochs.decimate(decim)
+    return epochs
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
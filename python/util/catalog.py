@@ -0,0 +1,564 @@
+"""
+File: catalog.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The on-disk catalog of the found files and their check results.
+
+    The catalog is the SQLite database in the cache folder,
+    the files are indexed by path, protocol, status, format and subject,
+    the checks and suspects are stored in their own tables, one row per item.
+    Every write is a transaction, so the interrupted run leaves the catalog consistent.
+
+    The channels table is the inverted index of the upper-cased channel names,
+    it is filled from the BDF headers, and finds the files with the channels instantly.
+
+    The events table is the inverted index of the event codes,
+    every (file, code) has its count and the sample onsets,
+    it is filled from the evt.bdf once, and the loaders use the events without parsing the annotations again.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import re
+import json
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger, cache_path
+from .find_files import subject_of, as_categoricals
+from .bdf_header import BDFHeader, HeaderRaw, event_pattern
+
+# The catalogs shared by the threads of the process, {catalog_path: Catalog} of every thread
+_local = threading.local()
+
+# Increase it when the tables change, the event tables are dropped and indexed again
+schema_version = 2
+
+# The columns of the found files in the catalog
+file_columns = ['path', 'short_name', 'protocol', 'subject', 'format',
+                'evt_path', 'content', 'canonical', 'n_copies']
+
+schema = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    short_name TEXT,
+    protocol TEXT,
+    subject TEXT,
+    format TEXT,
+    evt_path TEXT,
+    content TEXT,
+    canonical TEXT,
+    n_copies INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS files_protocol_status ON files (protocol, status);
+CREATE INDEX IF NOT EXISTS files_status ON files (status);
+CREATE INDEX IF NOT EXISTS files_format ON files (format);
+CREATE INDEX IF NOT EXISTS files_subject ON files (subject);
+
+CREATE TABLE IF NOT EXISTS checks (
+    path TEXT REFERENCES files (path) ON DELETE CASCADE,
+    name TEXT,
+    value TEXT,
+    PRIMARY KEY (path, name)
+);
+
+CREATE TABLE IF NOT EXISTS suspects (
+    path TEXT REFERENCES files (path) ON DELETE CASCADE,
+    name TEXT,
+    seq INTEGER,
+    message TEXT,
+    PRIMARY KEY (path, name, seq)
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+    path TEXT REFERENCES files (path) ON DELETE CASCADE,
+    idx INTEGER,
+    name TEXT,
+    upper TEXT,
+    PRIMARY KEY (path, idx)
+);
+CREATE INDEX IF NOT EXISTS channels_upper ON channels (upper, path);
+
+CREATE TABLE IF NOT EXISTS event_files (
+    path TEXT PRIMARY KEY REFERENCES files (path) ON DELETE CASCADE,
+    normpath TEXT,
+    sfreq REAL,
+    n_events INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    evt_size INTEGER,
+    evt_mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS event_files_normpath ON event_files (normpath);
+
+CREATE TABLE IF NOT EXISTS events (
+    path TEXT REFERENCES files (path) ON DELETE CASCADE,
+    code TEXT,
+    count INTEGER,
+    samples BLOB,
+    positions BLOB,
+    PRIMARY KEY (path, code)
+);
+CREATE INDEX IF NOT EXISTS events_code ON events (code, count, path);
+'''
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _json_default(obj):
+    """
+    Converts the numpy and Path values for the json.
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, Path):
+        return obj.as_posix()
+    raise TypeError(f'Not JSON serializable: {type(obj)}')
+
+
+def _normcase(path: str) -> str:
+    """
+    Returns the normalized path to compare, the paths are case insensitive on Windows.
+    """
+    return os.path.normcase(Path(path).as_posix())
+
+
+def _stat_signature(path) -> tuple:
+    """
+    Returns the (size, mtime_ns) of the file, or (None, None) if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+
+def _as_text(value):
+    """
+    Returns the posix string of the path, or None if it is missing (like the NaN of the DataFrame).
+    """
+    if isinstance(value, Path):
+        return value.as_posix()
+    if isinstance(value, str):
+        return value
+    return None
+
+
+class Catalog(object):
+    """
+    The SQLite catalog of the found files and their check results.
+
+    Attributes:
+        path (Path): The path of the database file.
+        conn (sqlite3.Connection): The connection.
+    """
+
+    path = None
+    conn = None
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or cache_path.joinpath('catalog.sqlite'))
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < schema_version:
+            self.conn.executescript(
+                'DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS event_files;')
+            self.conn.execute(f'PRAGMA user_version = {schema_version}')
+        self.conn.executescript(schema)
+        logger.debug(f'Opened catalog: {self.path}')
+
+    def close(self):
+        self.conn.close()
+
+    def sync_files(self, found_files: pd.DataFrame):
+        """
+        Updates the found files in one transaction.
+        The new files are inserted, the known files keep their check results,
+        and the files not found anymore are deleted with their check results.
+
+        Args:
+            found_files (pd.DataFrame): The found files.
+        """
+        rows = []
+        for _, file in found_files.iterrows():
+            n_copies = file.get('n_copies', 1)
+            rows.append((
+                _as_text(file['path']),
+                file.get('short_name'),
+                file.get('protocol'),
+                subject_of(file),
+                file.get('format'),
+                _as_text(file.get('evt_path')),
+                file.get('content'),
+                _as_text(file.get('canonical')),
+                int(n_copies) if pd.notna(n_copies) else 1,
+            ))
+
+        known = dict(self.conn.execute('SELECT path, content FROM files'))
+
+        changed = [(e[0],) for e in rows if e[0] in known and known[e[0]] != e[6]]
+
+        with self.conn:
+            # The channels and events of the changed files are indexed again
+            for table in ['channels', 'event_files', 'events']:
+                self.conn.executemany(f'DELETE FROM {table} WHERE path = ?', changed)
+
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS found (path TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM found')
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO found VALUES (?)', [(e[0],) for e in rows])
+            n = self.conn.execute(
+                'DELETE FROM files WHERE path NOT IN (SELECT path FROM found)').rowcount
+            self.conn.executemany(
+                f'''INSERT INTO files ({', '.join(file_columns)}) VALUES ({', '.join('?' * len(file_columns))})
+                ON CONFLICT (path) DO UPDATE SET {', '.join(f'{k} = excluded.{k}' for k in file_columns[1:])}''',
+                rows)
+
+        logger.info(
+            f'Synced catalog: {len(rows)} files, removed {n} files')
+
+    def index_channels(self, max_workers: int = 8):
+        """
+        Indexes the channels of the .bdf files not indexed yet, from their headers.
+
+        Args:
+            max_workers (int, optional): The number of the reading threads, defaults to 8.
+        """
+        paths = [e for e, in self.conn.execute(
+            '''SELECT path FROM files WHERE format = '.bdf'
+            AND path NOT IN (SELECT DISTINCT path FROM channels)''')]
+
+        def _read(path):
+            try:
+                return BDFHeader(path).ch_names
+            except Exception as err:
+                logger.warning(f'Failed reading channels: {path}, {err}')
+                return []
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            ch_names = list(executor.map(_read, paths))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?)',
+                [(path, i, name, name.upper())
+                 for path, names in zip(paths, ch_names) for i, name in enumerate(names)])
+
+        logger.info(f'Indexed channels of {len(paths)} files')
+
+    def files_with_channels(self, names: list, where: str = None, params: tuple = ()) -> pd.DataFrame:
+        """
+        Queries the checked files that have all the channels, the names are case-insensitive.
+
+        Args:
+            names (list): The channel names, like ['C3', 'CZ', 'C4'].
+            where (str, optional): The additional SQL condition on the files table, like 'protocol = ?'.
+            params (tuple, optional): The parameters of the condition.
+
+        Returns:
+            pd.DataFrame: The checked files, sorted by path.
+        """
+        names = sorted({e.strip().upper() for e in names if e.strip()})
+        condition = f'''path IN (
+            SELECT path FROM channels WHERE upper IN ({', '.join('?' * len(names))})
+            GROUP BY path HAVING COUNT(DISTINCT upper) = ?)'''
+        if where:
+            condition += f' AND ({where})'
+        return self.query(condition, (*names, len(names), *params))
+
+    def channels_of(self, path) -> list:
+        """
+        Returns the channel names of the file in their order.
+        """
+        return [e for e, in self.conn.execute(
+            'SELECT name FROM channels WHERE path = ? ORDER BY idx', (_as_text(path),))]
+
+    def montage_split(self, path, montage_names: list):
+        """
+        Splits the channels of the file by the montage without loading the file.
+        The names are upper-cased, the same as LoadRawData.filter_ch_names does.
+
+        Args:
+            path (Path): The path of the file.
+            montage_names (list): The channel names of the montage.
+
+        Returns:
+            list: The channels inside the montage.
+            list: The channels outside the montage.
+        """
+        montage_names = {e.upper() for e in montage_names}
+        ch_names = [e.upper() for e in self.channels_of(path)]
+        inside = [e for e in ch_names if e in montage_names]
+        outside = [e for e in ch_names if e not in montage_names]
+        return inside, outside
+
+    def index_events(self, max_workers: int = 8):
+        """
+        Indexes the events of the .bdf files not indexed yet, from their evt.bdf.
+        The events are the same as mne.events_from_annotations gives, the BAD and EDGE annotations are dropped.
+        The sizes and mtimes of the files are recorded, so the events of the changed files are not used.
+
+        Args:
+            max_workers (int, optional): The number of the reading threads, defaults to 8.
+        """
+        todo = list(self.conn.execute(
+            '''SELECT path, evt_path FROM files WHERE format = '.bdf' AND evt_path IS NOT NULL
+            AND path NOT IN (SELECT path FROM event_files)'''))
+
+        regexp = re.compile(event_pattern)
+
+        def _read(path, evt_path):
+            signature = _stat_signature(path) + _stat_signature(evt_path)
+            try:
+                raw = HeaderRaw(path, evt_path)
+            except Exception as err:
+                logger.warning(f'Failed reading events: {path}, {err}')
+                return None
+
+            keep = np.array([regexp.match(e) is not None for e in raw.descriptions], dtype=bool)
+            descriptions = np.array(raw.descriptions, dtype=str)[keep]
+
+            sfreq = raw.info['sfreq']
+            samples = np.round(raw.onsets[keep] * sfreq).astype(np.int64)
+            codes, inverse = np.unique(descriptions, return_inverse=True)
+            rows = []
+            for k, code in enumerate(codes):
+                positions = np.flatnonzero(inverse == k).astype(np.int64)
+                rows.append((
+                    path, str(code), len(positions),
+                    samples[positions].tobytes(), positions.tobytes()))
+            normpath = _normcase(Path(path).resolve())
+            return (path, normpath, sfreq, len(samples), *signature), rows
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            outputs = [e for e in executor.map(lambda e: _read(*e), todo) if e is not None]
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO event_files VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [e[0] for e in outputs])
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)', [r for e in outputs for r in e[1]])
+
+        logger.info(f'Indexed events of {len(outputs)} | {len(todo)} files')
+
+    def files_with_events(self, codes: list, min_count: int = 1, where: str = None, params: tuple = ()) -> pd.DataFrame:
+        """
+        Queries the checked files that have at least min_count events of every code.
+
+        Args:
+            codes (list): The event codes, like [200, 201, 202].
+            min_count (int, optional): The minimum number of the events of every code, defaults to 1.
+            where (str, optional): The additional SQL condition on the files table, like 'protocol = ?'.
+            params (tuple, optional): The parameters of the condition.
+
+        Returns:
+            pd.DataFrame: The checked files, sorted by path.
+        """
+        codes = sorted({str(e) for e in codes})
+        condition = f'''path IN (
+            SELECT path FROM events WHERE code IN ({', '.join('?' * len(codes))}) AND count >= ?
+            GROUP BY path HAVING COUNT(*) = ?)'''
+        if where:
+            condition += f' AND ({where})'
+        return self.query(condition, (*codes, min_count, len(codes), *params))
+
+    def _indexed_path(self, path, content: str = None):
+        """
+        Finds the path of the indexed events of the file.
+        The file is found by the path, or the content fingerprint, since the copies have the same events,
+        or the normalized path, since the folders may be spelled differently, like D:/ and d:/ on Windows.
+
+        Returns:
+            str | None: The path in the catalog, or None if the file is not indexed.
+        """
+        path = _as_text(path)
+        row = self.conn.execute(
+            'SELECT path FROM event_files WHERE path = ?', (path,)).fetchone()
+        if row is None and content is not None:
+            row = self.conn.execute(
+                '''SELECT event_files.path FROM event_files JOIN files ON event_files.path = files.path
+                WHERE files.content = ? LIMIT 1''', (content,)).fetchone()
+        if row is None:
+            row = self.conn.execute(
+                'SELECT path FROM event_files WHERE normpath = ? LIMIT 1',
+                (_normcase(Path(path).resolve()),)).fetchone()
+        return None if row is None else row[0]
+
+    def events_of(self, path, content: str = None):
+        """
+        Returns the indexed events of the file, the same as mne.events_from_annotations of the loaded raw.
+
+        Args:
+            path (Path): The path of the file.
+            content (str, optional): The content fingerprint of the file, the copies share the indexed events.
+
+        Returns:
+            np.ndarray: The events array of (n, 3).
+            dict: The event_id.
+            Or None if the file is not indexed, it is changed since indexed, or it has no events.
+        """
+        path = self._indexed_path(path, content)
+        if path is None:
+            return None
+        row = self.conn.execute(
+            '''SELECT event_files.n_events, event_files.size, event_files.mtime_ns,
+            event_files.evt_size, event_files.evt_mtime_ns, files.evt_path
+            FROM event_files JOIN files ON event_files.path = files.path
+            WHERE event_files.path = ?''', (path,)).fetchone()
+        if row is None or row[0] == 0:
+            # Leave the error of no events to mne
+            return None
+
+        if row[1:5] != _stat_signature(path) + _stat_signature(row[5]):
+            logger.debug(f'Ignored indexed events of the changed file: {path}')
+            return None
+
+        rows = list(self.conn.execute(
+            'SELECT code, samples, positions FROM events WHERE path = ?', (path,)))
+        event_id = {code: i + 1 for i, code in enumerate(sorted(e[0] for e in rows))}
+
+        events = np.zeros((row[0], 3), dtype=np.int64)
+        for code, samples, positions in rows:
+            positions = np.frombuffer(positions, dtype=np.int64)
+            events[positions, 0] = np.frombuffer(samples, dtype=np.int64)
+            events[positions, 2] = event_id[code]
+        return events, event_id
+
+    def put_results(self, outputs: list):
+        """
+        Writes the check results in one transaction.
+
+        Args:
+            outputs (list): The outputs of the format_check.
+        """
+        with self.conn:
+            for output in outputs:
+                path = _as_text(output['path'])
+                self.conn.execute(
+                    'UPDATE files SET status = ? WHERE path = ?', (output['status'], path))
+                self.conn.execute('DELETE FROM checks WHERE path = ?', (path,))
+                self.conn.execute('DELETE FROM suspects WHERE path = ?', (path,))
+
+                checks = output.get('checks')
+                if isinstance(checks, dict):
+                    self.conn.executemany(
+                        'INSERT INTO checks VALUES (?, ?, ?)',
+                        [(path, k, json.dumps(v, default=_json_default)) for k, v in checks.items()])
+
+                suspects = output.get('suspects')
+                if isinstance(suspects, dict):
+                    self.conn.executemany(
+                        'INSERT INTO suspects VALUES (?, ?, ?, ?)',
+                        [(path, k, i, message)
+                         for k, v in suspects.items() for i, message in enumerate(v)])
+
+    def put_result(self, output: dict):
+        """
+        Writes the check result in its own transaction.
+        """
+        self.put_results([output])
+
+    def query(self, where: str = None, params: tuple = ()) -> pd.DataFrame:
+        """
+        Queries the checked files.
+
+        Args:
+            where (str, optional): The SQL condition on the files table, like 'status = ?'.
+            params (tuple, optional): The parameters of the condition.
+
+        Returns:
+            pd.DataFrame: The checked files with the status, sorted by path.
+                          The protocol, format and status are the categoricals.
+        """
+        sql = 'SELECT * FROM files WHERE status IS NOT NULL'
+        if where:
+            sql += f' AND ({where})'
+        sql += ' ORDER BY path'
+        return as_categoricals(pd.read_sql_query(sql, self.conn, params=params))
+
+    def details(self, path) -> dict:
+        """
+        Returns the checks and suspects of the file.
+
+        Returns:
+            dict: dict(checks={name: value}, suspects={name: [messages]}).
+        """
+        path = _as_text(path)
+        checks = {
+            k: json.loads(v) for k, v in self.conn.execute(
+                'SELECT name, value FROM checks WHERE path = ? ORDER BY rowid', (path,))}
+
+        suspects = {}
+        for k, message in self.conn.execute(
+                'SELECT name, message FROM suspects WHERE path = ? ORDER BY rowid', (path,)):
+            suspects.setdefault(k, []).append(message)
+
+        return dict(checks=checks, suspects=suspects)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Counts the checked files by status, protocol and format.
+        """
+        return pd.read_sql_query(
+            '''SELECT status, protocol, format, COUNT(*) AS path FROM files
+            WHERE status IS NOT NULL GROUP BY status, protocol, format''',
+            self.conn)
+
+
+def indexed_events(path, content: str = None, catalog_path: Path = None):
+    """
+    Returns the indexed events of the file, or None if the catalog or the file is not indexed.
+    The catalog is opened once for every thread of the process.
+
+    Args:
+        path (Path): The path of the file.
+        content (str, optional): The content fingerprint of the file, see Catalog.events_of.
+        catalog_path (Path, optional): The path of the catalog, defaults to the one in the cache folder.
+    """
+    catalog_path = Path(catalog_path or cache_path.joinpath('catalog.sqlite'))
+    if not catalog_path.is_file():
+        return None
+
+    catalogs = getattr(_local, 'catalogs', None)
+    if catalogs is None:
+        catalogs = _local.catalogs = {}
+
+    catalog = catalogs.get(catalog_path)
+    if catalog is None:
+        catalog = catalogs[catalog_path] = Catalog(catalog_path)
+    return catalog.events_of(path, content)
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
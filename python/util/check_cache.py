@@ -0,0 +1,192 @@
+"""
+File: check_cache.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The cache of the format_check results.
+
+    The results are keyed by the fingerprint of the file,
+    (path, size, mtime and the md5 of the evt.bdf),
+    together with the version of the protocol's rules.
+    The unchanged file with the unchanged rules is not checked again.
+
+    The results are appended to the cache file as soon as they are finished,
+    so the interrupted run resumes where it stopped.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import pickle
+import hashlib
+
+from pathlib import Path
+
+from . import logger
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _md5_file(path: Path, chunk: int = 1024 * 1024) -> str:
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        while b := f.read(chunk):
+            h.update(b)
+    return h.hexdigest()
+
+
+def _as_path(value):
+    """
+    Returns the Path of the value, or None if it is missing (like the NaN of the DataFrame).
+    """
+    if isinstance(value, (str, Path)):
+        return Path(value)
+    return None
+
+
+def file_fingerprint(file) -> tuple:
+    """
+    Computes the fingerprint of the file.
+
+    Args:
+        file (dict | pd.Series): The found file, it has 'path' and 'evt_path'.
+
+    Returns:
+        tuple: (path, size, mtime_ns, evt_md5), the evt_md5 is None if the file has no evt.bdf.
+               The size and mtime_ns are None if the file is missing.
+    """
+    path = _as_path(file['path'])
+    evt_path = _as_path(file.get('evt_path'))
+
+    try:
+        st = os.stat(path)
+        size, mtime = st.st_size, st.st_mtime_ns
+    except OSError:
+        size, mtime = None, None
+
+    evt_md5 = None
+    if evt_path is not None:
+        try:
+            evt_md5 = _md5_file(evt_path)
+        except OSError:
+            pass
+
+    return (path.as_posix(), size, mtime, evt_md5)
+
+
+class CheckCache(object):
+    """
+    The append-only cache of the check results.
+
+    Every entry is a pickled dict(fingerprint, version, output) appended to the file,
+    the later entry overrides the earlier one of the same path.
+    The broken tail of the interrupted write is cut off when loading.
+    """
+
+    path = None
+    entries = {}
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """
+        Loads the entries from the cache file.
+        """
+        if not self.path.is_file():
+            logger.debug(f'No check cache found: {self.path}')
+            return
+
+        n = 0
+        good = 0
+        broken = False
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    entry = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as err:
+                    # The last entry is broken by the interruption
+                    logger.warning(
+                        f'Stopped reading broken check cache: {self.path}, after {n} entries, {err}')
+                    broken = True
+                    break
+                self.entries[entry['fingerprint'][0]] = entry
+                good = f.tell()
+                n += 1
+
+        # Cut the broken tail, so the new entries are appended after the good ones
+        if broken:
+            os.truncate(self.path, good)
+
+        logger.debug(
+            f'Loaded check cache: {self.path}, {len(self.entries)} | {n} entries')
+
+    def get(self, fingerprint: tuple, version):
+        """
+        Returns the cached output of the fingerprint and the rules version, or None if missed.
+        """
+        entry = self.entries.get(fingerprint[0])
+        if entry is None:
+            return None
+        if entry['fingerprint'] != fingerprint or entry['version'] != version:
+            return None
+        return entry['output']
+
+    def put(self, fingerprint: tuple, version, output: dict):
+        """
+        Appends the output to the cache file immediately.
+        """
+        entry = dict(fingerprint=fingerprint, version=version, output=output)
+        self.entries[fingerprint[0]] = entry
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        with open(self.path, 'ab') as f:
+            pickle.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self, keep: set = None):
+        """
+        Rewrites the cache file with only the latest entries.
+
+        Args:
+            keep (set, optional): Only keep the entries of the paths in it, defaults to keep all of them.
+        """
+        if keep is not None:
+            keep = {_as_path(e).as_posix() for e in keep}
+            self.entries = {
+                k: v for k, v in self.entries.items() if k in keep}
+
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            for entry in self.entries.values():
+                pickle.dump(entry, f)
+        os.replace(tmp, self.path)
+        logger.debug(
+            f'Compacted check cache: {self.path}, {len(self.entries)} entries')
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
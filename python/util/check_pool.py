@@ -0,0 +1,232 @@
+"""
+File: check_pool.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Run the format_check in the pool of worker processes.
+
+    Every worker process checks one file at a time.
+    The worker that hangs longer than the timeout is killed,
+    and the worker that dies (segfault on the corrupt file) is replaced,
+    the file it was checking becomes the failed row with the reason.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import time
+import traceback
+import multiprocessing as mp
+
+from typing import Callable
+from multiprocessing.connection import wait
+from tqdm.auto import tqdm
+
+from . import logger
+
+# The columns of the check results, in the fixed order
+check_results_columns = ['path', 'status', 'checks', 'suspects']
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def failed_output(file, reason: str):
+    """
+    Makes the failed check result of the file with the reason, the same schema as format_check.
+    """
+    return dict(path=file['path'], status='failed', suspects=dict(traceback=[reason]))
+
+
+def _worker_loop(conn, kwargs: dict):
+    """
+    The loop of the worker process, it checks the files received from the conn.
+    The None ends the loop.
+
+    Args:
+        conn: The connection to the main process.
+        kwargs (dict): The keyword arguments of the format_check.
+    """
+    from .find_files import format_check
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+
+        i, file = task
+        try:
+            output = format_check(file, **kwargs)
+        except Exception:
+            output = failed_output(file, traceback.format_exc())
+        conn.send((i, output))
+
+
+class CheckWorker(object):
+    """
+    The worker process checking the files one at a time, and its connection.
+    It is shared by the parallel_format_check and the work queue workers.
+
+    Attributes:
+        kwargs (dict): The keyword arguments of the format_check, like header_only and fail_fast.
+        conn: The connection to the worker process, the (i, output) is received from it.
+        process: The worker process.
+        task (tuple): The (i, file) being checked, or None.
+        start (float): The time when the task is submitted.
+        n_tasks (int): The number of the submitted tasks.
+    """
+
+    def __init__(self, ctx, kwargs: dict):
+        self.kwargs = dict(kwargs)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_loop, args=(child_conn, kwargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.start = None
+        self.n_tasks = 0
+
+    def submit(self, i, file):
+        self.conn.send((i, file))
+        self.task = (i, file)
+        self.start = time.time()
+        self.n_tasks += 1
+
+    def done(self):
+        self.task = None
+        self.start = None
+
+    def close(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def parallel_format_check(files: list, n_workers: int = None, timeout: float = 600, max_tasks: int = 100, callback: Callable = None, **kwargs) -> list:
+    """
+    Checks the files in the pool of worker processes.
+
+    Args:
+        files (list): The files to check, every element is the row of the found files.
+        n_workers (int, optional): The number of the worker processes, defaults to the cpu count.
+        timeout (float, optional): The seconds allowed for checking one file, defaults to 600.
+        max_tasks (int, optional): The worker is replaced after checking max_tasks files to release its memory, defaults to 100.
+        callback (Callable, optional): It is called as callback(i, output) as soon as the i-th file is finished.
+        **kwargs: The keyword arguments of the format_check, like header_only.
+
+    Returns:
+        list: The check results in the same order as the files.
+    """
+    files = list(files)
+    if len(files) == 0:
+        return []
+
+    n_workers = min(n_workers or os.cpu_count(), len(files))
+    ctx = mp.get_context('spawn')
+
+    outputs = [None] * len(files)
+
+    def _finish(i, output):
+        outputs[i] = output
+        if callback is not None:
+            callback(i, output)
+    todo = list(range(len(files)))[::-1]
+    workers = [CheckWorker(ctx, kwargs) for _ in range(n_workers)]
+    logger.info(
+        f'Started {n_workers} format check workers for {len(files)} files')
+
+    bar = tqdm(total=len(files), desc='Format checking')
+    try:
+        while todo or any(w.task is not None for w in workers):
+            # Feed the idle workers
+            for k, w in enumerate(workers):
+                if w.task is None and todo:
+                    if not w.process.is_alive():
+                        w.close(kill=True)
+                        w = workers[k] = CheckWorker(ctx, kwargs)
+                    i = todo.pop()
+                    w.submit(i, files[i])
+
+            busy = [w for w in workers if w.task is not None]
+            ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=1.0)
+
+            for k, w in enumerate(workers):
+                if w.task is None:
+                    continue
+
+                i, file = w.task
+                replace = False
+
+                if w.conn in ready:
+                    try:
+                        j, output = w.conn.recv()
+                        _finish(j, output)
+                        replace = w.n_tasks >= max_tasks
+                    except (EOFError, OSError):
+                        _finish(i, failed_output(
+                            file, f'Worker died with exitcode {w.process.exitcode}'))
+                        logger.error(f'Format check worker died: {file["path"]}')
+                        replace = True
+
+                elif w.process.sentinel in ready:
+                    w.process.join()
+                    _finish(i, failed_output(
+                        file, f'Worker died with exitcode {w.process.exitcode}'))
+                    logger.error(f'Format check worker died: {file["path"]}')
+                    replace = True
+
+                elif time.time() - w.start > timeout:
+                    _finish(i, failed_output(
+                        file, f'Timeout after {timeout} seconds'))
+                    logger.error(f'Format check timeout: {file["path"]}')
+                    w.close(kill=True)
+                    workers[k] = CheckWorker(ctx, kwargs)
+                    bar.update()
+                    continue
+
+                else:
+                    continue
+
+                w.done()
+                bar.update()
+                if replace:
+                    w.close(kill=not w.process.is_alive())
+                    workers[k] = CheckWorker(ctx, kwargs)
+
+    finally:
+        bar.close()
+        for w in workers:
+            w.close(kill=w.task is not None)
+
+    return outputs
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,89 @@
+"""
+File: content_fingerprint.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The cheap fingerprint of the recording's content.
+
+    The same session is often copied into several experiment or subject folders,
+    the copies have the same content fingerprint no matter where they are.
+    Only the header, some sampled blocks of the data and the evt.bdf are read,
+    so it costs some kilobytes for the file of gigabytes.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import hashlib
+
+from pathlib import Path
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _header_bytes(head: bytes) -> int:
+    """
+    Returns the header bytes of the BDF (or EDF) header, or 256 if it is not the one.
+    """
+    try:
+        return int(head[184:192].decode('latin-1').strip())
+    except ValueError:
+        return 256
+
+
+def content_fingerprint(path: Path, evt_path: Path = None, n_blocks: int = 4, block_size: int = 4096) -> str:
+    """
+    Computes the content fingerprint of the recording.
+
+    Args:
+        path (Path): The path of the data file.
+        evt_path (Path, optional): The path of the evt.bdf, it is read as a whole since it is small.
+        n_blocks (int, optional): The number of the blocks evenly sampled from the data, defaults to 4.
+        block_size (int, optional): The bytes of every block, defaults to 4096.
+
+    Returns:
+        str: The md5 hex digest of the file size, the header, the sampled blocks and the evt.bdf.
+    """
+    h = hashlib.md5()
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        h.update(f'{size}'.encode())
+
+        f.seek(0)
+        head = f.read(256)
+        header_bytes = min(max(_header_bytes(head), len(head)), size)
+        h.update(head)
+        h.update(f.read(header_bytes - len(head)))
+
+        span = max(size - header_bytes - block_size, 0)
+        for k in range(n_blocks):
+            f.seek(header_bytes + span * k // max(n_blocks - 1, 1))
+            h.update(f.read(block_size))
+
+    if isinstance(evt_path, (str, Path)):
+        with open(evt_path, 'rb') as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -18,11 +18,10 @@ Functions:
 
 # %% ---- 2024-04-23 ------------------------
 # Requirements and constants
-import os
-import mne
+import sys
 import json
+import posixpath
 import traceback
-import numpy as np
 import pandas as pd
 
 from pathlib import Path
@@ -32,36 +31,97 @@ from tqdm.auto import tqdm
 
 from . import logger, project_root
 from .load_raw import RawObject
+from .bdf_header import check_structure
+from .protocol_rules import find_rule_set
+from .scan_manifest import ScanManifest
+from .content_fingerprint import content_fingerprint
+from .walker import walk_roots, default_max_workers
 
 
 # %% ---- 2024-04-23 ------------------------
 # Function and class
-class AttrDict(dict):
-    def __setattr__(self, name: str, value: Any) -> None:
-        return super().__setattr__(name, value)
-
-    def __getattribute__(self, name: str) -> Any:
-        try:
-            # Get the supposed-to-be attribute
-            return super().__getattribute__(name)
-        except AttributeError as e:
-            # If not exists, search for key-value pairs
-            if name not in self:
-                raise AttributeError(
-                    f'Attribute "{name}" does not exist') from e
-            return super().get(name)
-
-
-class EEG_File(AttrDict):
-    protocol = None
-    path = None
-    evt_path = None
-    format = None
-    short_name = None
-
-    def __init__(self, **kwargs):
-        for k, v in kwargs.items():
-            self[k] = v
+class EEG_File(object):
+    """
+    The compact record of the found file, the paths are the posix strings.
+    It is read as the attributes, or as the dict like file['path'] and file.get('evt_path').
+
+    Only the root, the short name and whether the evt.bdf exists are stored,
+    the root string is interned and shared by the records of the same root, so it is pickled once.
+    The path, evt_path, protocol and format are derived from them.
+    """
+
+    __slots__ = ('root', 'short_name', 'has_evt')
+
+    # The fields read as the dict, and the columns of the files_table
+    fields = ('path', 'evt_path', 'short_name', 'protocol', 'format')
+
+    def __init__(self, root: str, short_name: str, has_evt: bool = False):
+        self.root = sys.intern(root.rstrip('/'))
+        self.short_name = short_name
+        self.has_evt = has_evt
+
+    def __reduce__(self):
+        # The positional tuple is smaller than the state dict of the slots
+        return (EEG_File, (self.root, self.short_name, self.has_evt))
+
+    @property
+    def path(self) -> str:
+        return f'{self.root}/{self.short_name}'
+
+    @property
+    def evt_path(self) -> str:
+        if not self.has_evt:
+            return None
+        return f'{self.root}/{posixpath.dirname(self.short_name)}/evt.bdf'
+
+    @property
+    def protocol(self) -> str:
+        return self.short_name.split('/', 1)[0]
+
+    @property
+    def format(self) -> str:
+        return '.bdf' if self.short_name.endswith('.bdf') else '.cnt'
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.fields else default
+
+    def __repr__(self) -> str:
+        return f'EEG_File({", ".join(f"{k}={getattr(self, k)!r}" for k in self.fields)})'
+
+
+# The columns stored as the categoricals, they have few distinct values
+categorical_columns = ['protocol', 'format', 'status']
+
+
+def files_table(files: list) -> pd.DataFrame:
+    """
+    Makes the DataFrame of the found files column by column,
+    the protocol and format are the categoricals, and the paths are the strings.
+
+    Args:
+        files (list): The EEG_File records.
+
+    Returns:
+        pd.DataFrame: The found files.
+    """
+    df = pd.DataFrame(
+        {k: [getattr(e, k) for e in files] for k in EEG_File.fields})
+    return as_categoricals(df)
+
+
+def as_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the categorical columns of the DataFrame, see categorical_columns.
+    """
+    for k in categorical_columns:
+        if k in df.columns:
+            df[k] = df[k].astype('category')
+    return df
 
 
 def parse_as_eeg_file_path(path: Path, folder: Path):
@@ -76,18 +136,11 @@ def parse_as_eeg_file_path(path: Path, folder: Path):
     short_name = path.relative_to(folder).as_posix()
 
     if name.endswith('.cnt'):
-        output = EEG_File(
-            path=path, short_name=short_name, protocol=protocol, format='.cnt')
+        output = EEG_File(folder.as_posix(), short_name)
 
     if name == 'data.bdf':
-        evt_path = path.parent.joinpath('evt.bdf')
-
-        output = EEG_File(
-            path=path, short_name=short_name, protocol=protocol, format='.bdf')
-
-        if evt_path.is_file():
-            output = EEG_File(
-                path=path, evt_path=evt_path, short_name=short_name, protocol=protocol, format='.bdf')
+        has_evt = path.parent.joinpath('evt.bdf').is_file()
+        output = EEG_File(folder.as_posix(), short_name, has_evt)
 
     return output
 
@@ -108,30 +161,165 @@ def guess_protocol(path: Path, folder: Path) -> str:
     return name if name in known_protocols else None
 
 
-def find_files(folder: Path, limit: int = 1e6) -> list:
+def subject_of(file) -> str:
+    """
+    Returns the subject of the found file, the second part of its short name.
+    """
+    parts = Path(file['short_name']).parts
+    return parts[1] if len(parts) > 2 else ''
+
+
+def find_files(folder: Path, limit: int = 1e6, max_workers: int = default_max_workers) -> list:
+    """
+    Finds all the legal files in the folder.
+
+    Args:
+        folder (Path): The folder to search.
+        limit (int, optional): Stop searching when more than limit files are found.
+        max_workers (int, optional): The concurrency of the walking.
+
+    Returns:
+        pd.DataFrame: The found files, sorted by path.
+    """
+    return find_files_in_roots([(folder, max_workers)], limit=limit)
+
+
+def find_files_in_roots(roots: list, limit: int = 1e6) -> list:
+    """
+    Finds all the legal files in the roots concurrently.
+    The folders outside the known protocols are not walked into.
+
+    Args:
+        roots (list): The roots, every element is the folder or the (folder, max_workers) pair.
+        limit (int, optional): Stop searching when more than limit files are found.
+
+    Returns:
+        pd.DataFrame: The found files, sorted by path.
+    """
     buffer = []
 
-    # Each element of the res is (folder, subfolder, files)
-    res = os.walk(folder.as_posix())
-    for a, b, c in tqdm(res, 'Searching for files'):
+    res = walk_roots(roots, top_level=set(known_protocols))
+    for root, a, b, c in tqdm(res, 'Searching for files'):
         for d in c:
             path = Path(a, d)
-            efile = parse_as_eeg_file_path(path, folder)
+            efile = parse_as_eeg_file_path(path, root)
             if efile is not None:
                 buffer.append(efile)
 
         if len(buffer) > limit:
+            res.close()
             break
 
-    return pd.DataFrame(buffer)
+    buffer.sort(key=lambda e: e.path)
+    return files_table(buffer)
 
 
-def format_check(file: pd.Series):
+def scan_incremental(folder: Path, manifest_path: Path = None, max_workers: int = default_max_workers):
+    """
+    Finds all the legal files in the folder, only lists the changed directories since the last scan.
+    The manifest is not saved, the caller saves it after the changed files are handled,
+    so the changes are found again if the caller fails before.
+
+    Args:
+        folder (Path): The folder to search.
+        manifest_path (Path, optional): The path of the scan manifest, defaults to the one in the cache folder.
+        max_workers (int, optional): The concurrency of the walking.
+
+    Returns:
+        ScanManifest: The updated scan manifest.
+        pd.DataFrame: All the found files, see find_files_incremental.
+        dict: The delta since the last scan, see find_files_incremental.
+    """
+    manifest = ScanManifest(folder, manifest_path)
+    delta = manifest.rescan(
+        parse_as_eeg_file_path, top_level=set(known_protocols), max_workers=max_workers)
+    contents = manifest.update_contents(max_workers=max_workers)
+
+    keys = sorted(manifest.records)
+    buffer = [manifest.records[k] for k in keys]
+    found_files = mark_duplicates(
+        files_table(buffer), [contents[k] for k in keys])
+    return manifest, found_files, delta
+
+
+def find_files_incremental(folder: Path, manifest_path: Path = None, max_workers: int = default_max_workers):
+    """
+    Finds all the legal files in the folder, only lists the changed directories since the last scan.
+
+    Args:
+        folder (Path): The folder to search.
+        manifest_path (Path, optional): The path of the scan manifest, defaults to the one in the cache folder.
+        max_workers (int, optional): The concurrency of the walking.
+
+    Returns:
+        pd.DataFrame: All the found files, the same as find_files, with the duplicates marked, see mark_duplicates.
+        dict: The delta since the last scan, dict(added=[...], removed=[...], modified=[...]) of EEG_File.
+    """
+    manifest, found_files, delta = scan_incremental(folder, manifest_path, max_workers)
+    manifest.save()
+    return found_files, delta
+
+
+def mark_duplicates(found_files: pd.DataFrame, contents: list = None) -> pd.DataFrame:
+    """
+    Groups the copies of the same recording in the found files.
+
+    Args:
+        found_files (pd.DataFrame): The found files, sorted by path.
+        contents (list, optional): The content fingerprints of the found files, defaults to compute them.
+
+    Returns:
+        pd.DataFrame: The found files with the columns:
+            - content: The content fingerprint, None if the file is not readable.
+            - canonical: The path of the first copy of the same content, it is the path itself if it is not a copy.
+            - n_copies: The number of the copies of the same content.
+    """
+    if len(found_files) == 0:
+        return found_files.assign(content=None, canonical=None, n_copies=0)
+
+    found_files = found_files.copy()
+
+    if contents is None:
+        contents = []
+        for _, row in tqdm(found_files.iterrows(), 'Fingerprinting', total=len(found_files)):
+            try:
+                contents.append(content_fingerprint(row['path'], row.get('evt_path')))
+            except OSError:
+                contents.append(None)
+
+    found_files['content'] = contents
+    found_files['canonical'] = found_files['path']
+    found_files['n_copies'] = 1
+
+    # The unreadable files are not grouped
+    known = found_files['content'].notna()
+    group = found_files[known].groupby('content')['path']
+    found_files.loc[known, 'canonical'] = group.transform('first')
+    found_files.loc[known, 'n_copies'] = group.transform('count')
+
+    n = int((found_files['canonical'] != found_files['path']).sum())
+    if n > 0:
+        logger.info(f'Found {n} duplicated copies in {len(found_files)} files')
+
+    return found_files
+
+
+def get_rule_version(protocol: str) -> int:
+    """
+    Returns the version of the rules of the protocol, 0 refers the protocol has no rules.
+    """
+    rule_set = find_rule_set(protocol)
+    return 0 if rule_set is None else rule_set.version
+
+
+def format_check(file: pd.Series, header_only: bool = False, fail_fast: bool = False):
     """
     Performs format checks on the provided file and returns the status and checks results.
 
     Args:
         file (pd.Series): The file to perform format checks on.
+        header_only (bool, optional): Only read the header and the annotations, without the signal samples, defaults to False.
+        fail_fast (bool, optional): Run the cheapest rules first, and stop at the first failure, defaults to False.
 
     Returns:
         dict: A dictionary containing the path of the file and its status along with any checks performed.
@@ -140,216 +328,48 @@ def format_check(file: pd.Series):
     # obj = RawObject(file)
     output = dict(path=file['path'])
 
-    obj, suspects = _check_basic(file)
+    obj, suspects = _check_basic(file, header_only)
 
     # Can not load
     if obj is None:
         output |= dict(status='failed', suspects=suspects)
         return output
 
-    if file['protocol'] == 'SSVEP':
-        suspects, checks = _check_SSVEP(obj.raw)
-
-        if any(suspects.values()):
-            output |= dict(status='failed', checks=checks, suspects=suspects)
-            logger.warning(f'SSVEP checks failed: {output}')
-        else:
-            output |= dict(status='passed', checks=checks, suspects=suspects)
+    rule_set = find_rule_set(file['protocol'])
 
+    # Loaded but not checked
+    if rule_set is None:
+        output |= dict(status='unchecked', checks=[], suspects=[])
         return output
 
-    if file['protocol'].startswith('P300'):
-        suspects, checks = _check_P300(obj.raw)
-
-        if any(suspects.values()):
-            output |= dict(status='failed', checks=checks, suspects=suspects)
-            logger.warning(f'P300 checks failed: {output}')
-        else:
-            output |= dict(status='passed', checks=checks, suspects=suspects)
+    suspects, checks = rule_set.check(obj.raw, fail_fast=fail_fast)
 
-        return output
+    if any(suspects.values()):
+        output |= dict(status='failed', checks=checks, suspects=suspects)
+        logger.warning(f'{rule_set.name} checks failed: {output}')
+    else:
+        output |= dict(status='passed', checks=checks, suspects=suspects)
 
-    # Loaded but not checked
-    output |= dict(status='unchecked', checks=[], suspects=[])
     return output
 
 
-def _check_basic(file):
+def _check_basic(file, header_only: bool = False):
     suspects = {}
     obj = None
 
-    try:
-        obj = RawObject(file)
-    except Exception:
-        suspects['traceback'] = [traceback.format_exc()]
-
-    return obj, suspects
-
-
-def _check_P300(raw):
-    # Something I want to know
-    checks = dict(
-        ch_names=[],
-        sfreq=None,
-        event_id={},
-        total_length=None
-    )
-
-    # Something is wrong
-    suspects = dict(
-        channels=[],
-        sfreq=[],
-        n_events=[],
-    )
-
-    def _check():
-        # --------------------
-        # Fetch information
-        ch_names = raw.info['ch_names']
-        sfreq = raw.info['sfreq']
-        events, event_id = mne.events_from_annotations(raw)
-        total_length = np.max([e[0] for e in events]) / \
-            sfreq if len(events) > 0 else None
-        checks.update(
-            ch_names=ch_names,
-            sfreq=sfreq,
-            event_id=event_id,
-            total_length=total_length)
-
-        # --------------------
-        # Check channels
-        must_ch_names = [
-            e.strip().upper()
-            for e in 'Fz,F3,F4,Cz,C3,C4,CP1,CP2,CP5,CP6,Pz,P3,P4,P7,P8,POz,PO3,PO4,PO7,PO8,Oz,O1,O2'.split(',') if e.strip()]
-        ch_names = [e.upper() for e in ch_names]
-        for e in [e for e in must_ch_names if e not in ch_names]:
-            suspects['channels'].append(
-                f'The ch_names must contain {e}, which does not'
-            )
-
-        # --------------------
-        # Check sfreq not be less than 250 Hz
-        if sfreq < 250:
-            suspects['sfreq'].append(
-                f'The sfreq must not be less than 250 Hz, but the value is {
-                    sfreq}'
-            )
-
-        # --------------------
-        # Filter the valid events
-        # Check events minimum number not less than 9 kinds
-        event_id_inv = {v: k for k, v in event_id.items()}
-        events = [e for e in events if int(
-            event_id_inv[e[2]]) > 0 and int(event_id_inv[e[2]]) < 100]
-        n_events = {e[2] for e in events}
-        if len(n_events) < 9:
-            suspects['n_events'].append(
-                f'The (1-99) events should be equal or larger than 9 kinds, but the value is {
-                    len(n_events)}'
-            )
+    # The structurally broken files are failed without loading
+    if file['format'] == '.bdf':
+        problems = check_structure(file['path'], file.get('evt_path'))
+        if problems:
+            suspects['structure'] = problems
+            return obj, suspects
 
     try:
-        _check()
+        obj = RawObject(file, header_only=header_only)
     except Exception:
         suspects['traceback'] = [traceback.format_exc()]
 
-    return suspects, checks
-
-
-def _check_SSVEP(raw):
-    # Something I want to know
-    checks = dict(
-        ch_names=[],
-        sfreq=None,
-        event_id={},
-        total_length=None
-    )
-
-    # Something is wrong
-    suspects = dict(
-        channels=[],
-        sfreq=[],
-        n_events=[],
-        total_length=[],
-        min_gap=[],
-    )
-
-    def _check():
-        # --------------------
-        # Fetch information
-        ch_names = raw.info['ch_names']
-        sfreq = raw.info['sfreq']
-        events, event_id = mne.events_from_annotations(raw)
-        total_length = np.max([e[0] for e in events]) / \
-            sfreq if len(events) > 0 else None
-
-        checks.update(
-            ch_names=ch_names,
-            sfreq=sfreq,
-            event_id=event_id,
-            total_length=total_length)
-
-        # --------------------
-        # Check channels
-        must_ch_names = [
-            e.strip().upper()
-            for e in 'PO3,PO5,POz,PO4,PO6,O1,Oz,O2'.split(',') if e.strip()]
-        ch_names = [e.upper() for e in ch_names]
-
-        for e in [e for e in must_ch_names if e not in ch_names]:
-            suspects['channels'].append(
-                f'The ch_names must contain {e}, which does not'
-            )
-
-        # --------------------
-        # Check sfreq not be less than 250 Hz
-        if sfreq < 250:
-            suspects['sfreq'].append(
-                f'The sfreq must not be less than 250 Hz, but the value is {
-                    sfreq}'
-            )
-
-        # --------------------
-        # Check total length not be less than 180 seconds
-        if total_length is None or total_length < 180:
-            suspects['total_length'].append(
-                f'The total length must not be less than 180 seconds, but the value is {
-                    total_length}'
-            )
-
-        # --------------------
-        # Filter the valid events
-        # Check events minimum number not less than 10 kinds
-        event_id_inv = {v: k for k, v in event_id.items()}
-        events = [e for e in events if int(
-            event_id_inv[e[2]]) > 0 and int(event_id_inv[e[2]]) < 241]
-        n_events = {e[2] for e in events}
-        if len(n_events) < 10:
-            suspects['n_events'].append(
-                f'The (1-240) events should be equal or larger than 10 kinds, but the value is {
-                    len(n_events)}'
-            )
-
-        # --------------------
-        # Check the events are not within 1 seconds
-        lower_limit = sfreq * 1.0
-        sort = np.array(sorted(e[0] for e in events))
-        gaps = sort[1:] - sort[:-1]
-        min_gap = np.min(gaps)
-        if min_gap < lower_limit:
-            suspects['min_gap'].append(
-                f'The lower limit gap between the events are {
-                    lower_limit}({sfreq} Hz), but the value is {min_gap}'
-            )
-
-    try:
-        _check()
-    except Exception:
-        suspects['traceback'] = [traceback.format_exc()]
-
-    # --------------------
-    # No message is good message
-    return suspects, checks
+    return obj, suspects
 
 
 # %% ---- 2024-04-23 ------------------------
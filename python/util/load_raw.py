@@ -22,6 +22,8 @@ import mne
 import pandas as pd
 
 from . import logger
+from .bdf_header import HeaderRaw
+from .bdf_reader import read_raw_bdf
 
 
 # %% ---- 2024-04-23 ------------------------
@@ -29,15 +31,27 @@ from . import logger
 class RawObject(object):
     file = None
     raw = None
+    header_only = False
+    picks = None
 
-    def __init__(self, file: pd.Series):
+    def __init__(self, file: pd.Series, header_only: bool = False, picks: list = None):
         self.file = file
+        self.header_only = header_only
+        self.picks = picks
         self._load_raw()
 
     def _load_raw(self):
         file = self.file
 
-        if file['format'] == '.bdf':
+        if file['format'] == '.bdf' and self.header_only:
+            # Only the header of the data.bdf and the annotations of the evt.bdf are read
+            raw = HeaderRaw(file['path'], file['evt_path'])
+
+        elif file['format'] == '.bdf' and self.picks is not None:
+            # Only the picked channels are read and decoded
+            raw = read_raw_bdf(file['path'], file['evt_path'], picks=self.picks)
+
+        elif file['format'] == '.bdf':
             raw = mne.io.read_raw(file['path'])
             annotations = mne.read_annotations(file['evt_path'])
             raw.set_annotations(annotations)
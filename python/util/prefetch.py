@@ -0,0 +1,210 @@
+"""
+File: prefetch.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Prefetch the files ahead of the loop over the file infos.
+
+    The next files are read in the background threads while the current file is being processed,
+    so the disk or network time overlaps the compute time.
+    The readers open the files by their paths (and memory-map them),
+    so the bytes are read sequentially in the large chunks and left in the page cache of the OS,
+    where the following reads find them, instead of being held in the buffers.
+    The total size of the files read ahead and the files not released is capped,
+    so the prefetched pages are not pushed out before being used.
+    The file is released when the next one is taken,
+    or by the consumer when it is loaded, like the stream_load with the on_done.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import time
+import threading
+import collections
+
+from pathlib import Path
+from typing import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger
+
+# The number of the files read ahead of the current one
+default_read_ahead = 2
+
+# The cap of the bytes of the files read ahead and the files not released, 2 GB
+default_memory_cap = 2 * 1024**3
+
+# The bytes of every read, 16 MB
+default_chunk_size = 16 * 1024**2
+
+# The end of the files
+_end = object()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def file_paths(file_info: dict) -> list:
+    """
+    Returns the paths of the file info, the data file and its evt.bdf if exists.
+    """
+    path = Path(file_info['path'])
+    evt_path = path.parent.joinpath('evt.bdf')
+    if evt_path != path and evt_path.is_file():
+        return [path, evt_path]
+    return [path]
+
+
+def _size_of(file_info: dict) -> int:
+    try:
+        return sum(os.stat(p).st_size for p in file_paths(file_info))
+    except OSError:
+        return 0
+
+
+def read_files(file_info: dict, chunk_size: int = default_chunk_size) -> int:
+    """
+    Reads the files of the file info sequentially in the large chunks,
+    the bytes are left in the page cache of the OS.
+
+    Args:
+        file_info (dict): The file info, it has the path.
+        chunk_size (int, optional): The bytes of every read, defaults to 16 MB.
+
+    Returns:
+        int: The bytes read.
+    """
+    n = 0
+    buffer = memoryview(bytearray(chunk_size))
+    for path in file_paths(file_info):
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                k = f.readinto(buffer)
+                if not k:
+                    break
+                n += k
+    return n
+
+
+class Prefetch(object):
+    """
+    The iterator of the file infos in the same order,
+    the next read_ahead files are fetched in the background threads.
+    The file is held from fetched until released,
+    and the file is not fetched if it exceeds the memory cap with the held ones,
+    the iterator waits for the releases then.
+
+    Attributes:
+        fetch (Callable): The fetch of the file info, fetch(file_info) -> bytes.
+        read_ahead (int): The number of the files fetched ahead of the taken ones.
+        memory_cap (int): The cap of the bytes of the held files.
+        auto_release (bool): Whether the file is released when the next one is taken,
+                             it is False for the asynchronous consumer, which calls release when it finishes the file.
+    """
+
+    def __init__(self, files: Iterable, fetch: Callable = read_files, read_ahead: int = default_read_ahead, memory_cap: int = default_memory_cap, max_workers: int = 2, auto_release: bool = True):
+        self.files = files
+        self.fetch = fetch
+        self.read_ahead = read_ahead
+        self.memory_cap = memory_cap
+        self.max_workers = max_workers
+        self.auto_release = auto_release
+        # The taken and not released files, {id: (file_info, size, future)}
+        self._taken = {}
+        self._cond = threading.Condition()
+
+    def release(self, file_info: dict):
+        """
+        Releases the taken file, its bytes are not counted since then.
+        Its fetch is cancelled if not started, or waited if running,
+        so nothing is fetched for the file after it is released.
+        """
+        with self._cond:
+            taken = self._taken.pop(id(file_info), None)
+            self._cond.notify_all()
+
+        if taken is not None and not taken[2].cancel():
+            taken[2].result()
+
+    def _fetch(self, file_info):
+        tic = time.time()
+        try:
+            n = self.fetch(file_info)
+            logger.debug(
+                f'Prefetched {file_info["path"]}, {n} bytes in {time.time() - tic:.2f} seconds')
+        except Exception as err:
+            # The loader reads the file by itself
+            logger.warning(f'Failed prefetching {file_info["path"]}, {err}')
+
+    def __iter__(self):
+        files = iter(self.files)
+        window = collections.deque()
+        executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='prefetch')
+
+        peeked = None
+        exhausted = False
+        previous = None
+        try:
+            while True:
+                if self.auto_release and previous is not None:
+                    self.release(previous)
+                    previous = None
+
+                # Fill the window with the files read ahead, within the memory cap
+                while len(window) <= self.read_ahead:
+                    if peeked is None:
+                        file_info = next(files, _end)
+                        if file_info is _end:
+                            exhausted = True
+                            break
+                        peeked = (file_info, _size_of(file_info))
+
+                    with self._cond:
+                        held = len(window) + len(self._taken)
+                        used = sum(e[1] for e in window) + sum(e[1] for e in self._taken.values())
+                    if held and used + peeked[1] > self.memory_cap:
+                        break
+
+                    window.append(peeked + (executor.submit(self._fetch, peeked[0]),))
+                    peeked = None
+
+                if not window:
+                    if exhausted:
+                        break
+                    # The memory cap is full with the taken files
+                    with self._cond:
+                        self._cond.wait(timeout=1.0)
+                    continue
+
+                file_info, size, future = window.popleft()
+                with self._cond:
+                    self._taken[id(file_info)] = (file_info, size, future)
+                previous = file_info
+                yield file_info
+        finally:
+            # The iterator is closed or exhausted
+            for _, _, future in window:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,264 @@
+"""
+File: protocol_rules.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The format check rules of the protocols.
+
+    The rules are declared in the asset/protocol_rules.json,
+    every rule set has the protocols it applies to, its version and the ordered rules.
+    The rules are computed with the numpy operations over the events array,
+    and the information of the raw is extracted only once for all the rules.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import mne
+import json
+import traceback
+import numpy as np
+
+from functools import cached_property
+
+from . import logger, project_root
+from .bdf_header import HeaderRaw
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _events_from_annotations(raw):
+    """
+    Returns the events and event_id of the raw, or the HeaderRaw.
+    """
+    if isinstance(raw, HeaderRaw):
+        return raw.events_from_annotations()
+    return mne.events_from_annotations(raw)
+
+
+class Extraction(object):
+    """
+    The information of the raw shared by all the rules.
+    Every property is extracted on its first use, and only once.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    @cached_property
+    def ch_names(self) -> list:
+        return self.raw.info['ch_names']
+
+    @cached_property
+    def sfreq(self) -> float:
+        return self.raw.info['sfreq']
+
+    @cached_property
+    def _events(self):
+        return _events_from_annotations(self.raw)
+
+    @cached_property
+    def events(self) -> np.ndarray:
+        return np.asarray(self._events[0]).reshape(-1, 3)
+
+    @cached_property
+    def event_id(self) -> dict:
+        return self._events[1]
+
+    @cached_property
+    def codes(self) -> np.ndarray:
+        """
+        The integer codes of the events, the description that is not integer refers -1.
+        """
+        lut = np.full(max(self.event_id.values(), default=0) + 1, -1)
+        for desc, value in self.event_id.items():
+            try:
+                lut[value] = int(desc)
+            except ValueError:
+                pass
+        return lut[self.events[:, 2]]
+
+    @cached_property
+    def total_length(self):
+        if len(self.events) == 0:
+            return None
+        return np.max(self.events[:, 0]) / self.sfreq
+
+    def in_range(self, low: int, high: int) -> np.ndarray:
+        """
+        The mask of the events whose codes are in [low, high].
+        """
+        return (self.codes >= low) & (self.codes <= high)
+
+    def fetch(self):
+        """
+        Extracts all the information of the checks.
+        """
+        return self.ch_names, self.sfreq, self.event_id, self.total_length
+
+    def summary(self) -> dict:
+        """
+        The checks of what has been extracted.
+        """
+        output = {
+            k: self.__dict__[k] for k in ['ch_names', 'sfreq'] if k in self.__dict__}
+        if 'events' in self.__dict__ and 'sfreq' in output:
+            output.update(event_id=self.event_id, total_length=self.total_length)
+        return output
+
+
+def _required_channels(ext: Extraction, names: str) -> list:
+    must_ch_names = [e.strip().upper() for e in names.split(',') if e.strip()]
+    ch_names = {e.upper() for e in ext.ch_names}
+    return [
+        f'The ch_names must contain {e}, which does not'
+        for e in must_ch_names if e not in ch_names]
+
+
+def _min_sfreq(ext: Extraction, value: float) -> list:
+    if ext.sfreq < value:
+        return [f'The sfreq must not be less than {value} Hz, but the value is {ext.sfreq}']
+    return []
+
+
+def _min_total_length(ext: Extraction, value: float) -> list:
+    total_length = ext.total_length
+    if total_length is None or total_length < value:
+        return [f'The total length must not be less than {value} seconds, but the value is {total_length}']
+    return []
+
+
+def _min_event_kinds(ext: Extraction, low: int, high: int, value: int) -> list:
+    n = len(np.unique(ext.events[ext.in_range(low, high), 2]))
+    if n < value:
+        return [f'The ({low}-{high}) events should be equal or larger than {value} kinds, but the value is {n}']
+    return []
+
+
+def _min_event_gap(ext: Extraction, low: int, high: int, value: float) -> list:
+    lower_limit = ext.sfreq * value
+    sort = np.sort(ext.events[ext.in_range(low, high), 0])
+    if len(sort) < 2:
+        return [f'The lower limit gap between the events are {lower_limit}({ext.sfreq} Hz), but there are only {len(sort)} ({low}-{high}) events']
+    min_gap = np.min(np.diff(sort))
+    if min_gap < lower_limit:
+        return [f'The lower limit gap between the events are {lower_limit}({ext.sfreq} Hz), but the value is {min_gap}']
+    return []
+
+
+# The rule types, (function, cost),
+# the cheaper rule runs earlier in the fail-fast mode.
+rule_types = {
+    'min_sfreq': (_min_sfreq, 0),
+    'required_channels': (_required_channels, 1),
+    'min_total_length': (_min_total_length, 2),
+    'min_event_kinds': (_min_event_kinds, 3),
+    'min_event_gap': (_min_event_gap, 4),
+}
+
+
+class RuleSet(object):
+    """
+    The rule set of the protocols.
+
+    Attributes:
+        name (str): The name of the rule set.
+        protocols (list): The protocols it applies to.
+        version (int): The version of the rules, it is increased when the rules are changed.
+        rules (dict): The ordered rules, {suspect name: dict(type, **params)}.
+    """
+
+    def __init__(self, name: str, protocols: list, version: int, rules: dict):
+        self.name = name
+        self.protocols = protocols
+        self.version = version
+        self.rules = rules
+
+        for k, rule in rules.items():
+            if rule.get('type') not in rule_types:
+                raise ValueError(
+                    f'Unknown rule type of {name}.{k}: {rule.get("type")}')
+
+    def check(self, raw, fail_fast: bool = False):
+        """
+        Checks the raw with the rules.
+
+        Args:
+            raw (mne.io.Raw | HeaderRaw): The raw to check.
+            fail_fast (bool, optional): Run the rules from the cheapest one, and stop at the first failure, defaults to False.
+
+        Returns:
+            dict: The suspects, {suspect name: [messages]}, something is wrong.
+            dict: The checks, something I want to know.
+        """
+        checks = dict(
+            ch_names=[],
+            sfreq=None,
+            event_id={},
+            total_length=None
+        )
+        suspects = {k: [] for k in self.rules}
+
+        ext = Extraction(raw)
+        names = list(self.rules)
+        if fail_fast:
+            names.sort(key=lambda k: rule_types[self.rules[k]['type']][1])
+
+        try:
+            if not fail_fast:
+                # Fetch all the information at first
+                ext.fetch()
+
+            for k in names:
+                params = dict(self.rules[k])
+                func, _ = rule_types[params.pop('type')]
+                suspects[k].extend(func(ext, **params))
+                if fail_fast and suspects[k]:
+                    break
+        except Exception:
+            suspects['traceback'] = [traceback.format_exc()]
+
+        checks.update(ext.summary())
+        return suspects, checks
+
+
+def read_rule_sets() -> dict:
+    dct = json.load(open(project_root.joinpath(
+        'asset/protocol_rules.json'), encoding='utf8'))
+    rule_sets = {k: RuleSet(k, **v) for k, v in dct.items()}
+    logger.debug(f'Loaded protocol rules: {list(rule_sets)}')
+    return rule_sets
+
+
+rule_sets = read_rule_sets()
+
+
+def find_rule_set(protocol: str) -> RuleSet:
+    """
+    Returns the rule set of the protocol, or None if the protocol has no rules.
+    """
+    for rule_set in rule_sets.values():
+        if protocol in rule_set.protocols:
+            return rule_set
+    return None
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,189 @@
+"""
+File: quick_scan.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Quick scan of the found files by checking a stratified random sample.
+
+    The files are sampled round-robin across the protocols,
+    and across the subjects within every protocol,
+    so the sample is stratified whenever the time budget runs out.
+    The pass / fail rates are estimated with the Wilson confidence intervals,
+    in the same grouped form as the check-check-results.py.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import time
+import numpy as np
+import pandas as pd
+
+from statistics import NormalDist
+from tqdm.auto import tqdm
+
+from . import logger
+from .find_files import format_check, subject_of
+from .check_pool import check_results_columns
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _round_robin(groups: list) -> list:
+    """
+    Interleaves the lists, [[a, b], [c]] -> [a, c, b].
+    """
+    output = []
+    for k in range(max((len(e) for e in groups), default=0)):
+        output.extend(e[k] for e in groups if k < len(e))
+    return output
+
+
+def stratified_order(found_files: pd.DataFrame, seed: int = 0) -> list:
+    """
+    Orders the found files for sampling, stratified by protocol and subject.
+    Every prefix of the order is a stratified random sample.
+
+    Args:
+        found_files (pd.DataFrame): The found files.
+        seed (int, optional): The random seed, defaults to 0.
+
+    Returns:
+        list: The index of the found files in the sampling order.
+    """
+    rng = np.random.default_rng(seed)
+    subjects = found_files.apply(subject_of, axis=1)
+
+    protocols = []
+    for _, df in found_files.groupby('protocol', observed=True):
+        groups = []
+        for _, index in df.groupby(subjects[df.index]).groups.items():
+            groups.append(list(rng.permutation(index)))
+        rng.shuffle(groups)
+        protocols.append(_round_robin(groups))
+
+    return _round_robin(protocols)
+
+
+def quick_scan(found_files: pd.DataFrame, budget: float = 60, seed: int = 0, **kwargs) -> pd.DataFrame:
+    """
+    Checks the stratified random sample of the found files within the time budget.
+    Only the canonical copies are sampled if the duplicates are marked.
+
+    Args:
+        found_files (pd.DataFrame): The found files.
+        budget (float, optional): The seconds for checking, defaults to 60.
+        seed (int, optional): The random seed, defaults to 0.
+        **kwargs: The keyword arguments of the format_check, like header_only.
+
+    Returns:
+        pd.DataFrame: The check results of the sampled files.
+    """
+    if 'canonical' in found_files.columns:
+        found_files = found_files[found_files['canonical'] == found_files['path']]
+
+    order = stratified_order(found_files, seed)
+
+    buffer = []
+    tic = time.time()
+    for i in tqdm(order, 'Quick scanning'):
+        if time.time() - tic > budget:
+            break
+        buffer.append(format_check(found_files.loc[i], **kwargs))
+
+    logger.info(
+        f'Quick scanned {len(buffer)} | {len(order)} files in {time.time() - tic:.2f} seconds')
+    return pd.DataFrame(buffer, columns=check_results_columns)
+
+
+def wilson_interval(p: np.ndarray, n: np.ndarray, confidence: float = 0.95):
+    """
+    Computes the Wilson score interval of the proportion.
+
+    Args:
+        p (np.ndarray): The observed proportions.
+        n (np.ndarray): The (effective) sample sizes.
+        confidence (float, optional): The confidence level, defaults to 0.95.
+
+    Returns:
+        np.ndarray: The lower bounds.
+        np.ndarray: The upper bounds.
+    """
+    p = np.asarray(p, dtype=float)
+    n = np.asarray(n, dtype=float)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    denominator = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denominator
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denominator
+    return np.clip(center - half, 0, 1), np.clip(center + half, 0, 1)
+
+
+def estimate_rates(found_files: pd.DataFrame, sampled: pd.DataFrame, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Estimates the rates of the statuses from the sampled check results.
+
+    Every sampled file is weighted by the size of its subject over its sampled size,
+    the intervals use the effective sample size of the weights.
+
+    Args:
+        found_files (pd.DataFrame): All the found files.
+        sampled (pd.DataFrame): The check results of the sampled files.
+        confidence (float, optional): The confidence level, defaults to 0.95.
+
+    Returns:
+        pd.DataFrame: The estimates grouped by ['status', 'protocol', 'format'], the columns are
+            - sampled: The number of the sampled files of the status.
+            - rate, low, high: The estimated rate of the status in the protocol and its interval.
+            - estimated: The estimated number of the files of the status.
+    """
+    found_files = found_files.assign(subject=found_files.apply(subject_of, axis=1))
+    df = pd.merge(sampled[['path', 'status']], found_files, on='path')
+
+    population = found_files.groupby(['protocol', 'format', 'subject'], observed=True)['path'].count()
+    n_sampled = df.groupby(['protocol', 'format', 'subject'], observed=True)['path'].count()
+    weights = population / n_sampled
+    df['weight'] = weights.loc[list(zip(df['protocol'], df['format'], df['subject']))].values
+
+    buffer = []
+    for (protocol, fmt), group in df.groupby(['protocol', 'format'], observed=True):
+        total = group['weight'].sum()
+        n_eff = total**2 / (group['weight']**2).sum()
+        size = (found_files['protocol'] == protocol) & (found_files['format'] == fmt)
+        for status in ['passed', 'failed', 'unchecked']:
+            select = group['status'] == status
+            rate = group.loc[select, 'weight'].sum() / total
+            low, high = wilson_interval(rate, n_eff, confidence)
+            buffer.append(dict(
+                status=status,
+                protocol=protocol,
+                format=fmt,
+                sampled=int(select.sum()),
+                rate=rate,
+                low=float(low),
+                high=float(high),
+                estimated=rate * size.sum()))
+
+    columns = ['status', 'protocol', 'format', 'sampled', 'rate', 'low', 'high', 'estimated']
+    output = pd.DataFrame(buffer, columns=columns)
+    return output.set_index(['status', 'protocol', 'format']).sort_index()
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
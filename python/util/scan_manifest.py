@@ -0,0 +1,293 @@
+"""
+File: scan_manifest.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Persistent scan manifest for incremental re-scan of the data folder.
+
+    The manifest records every directory's mtime together with its listing,
+    and the size and mtime of every found file.
+    The re-scan only lists the directories whose mtime changed,
+    the unchanged directories reuse the recorded listing.
+
+    ! The directories are still stat-ed one by one,
+    ! since a change in the nested folder does not touch the mtime of its parents.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import pickle
+import posixpath
+import hashlib
+
+from pathlib import Path
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger, cache_path
+from .walker import walk_roots, scan_dir, default_max_workers
+from .content_fingerprint import content_fingerprint
+
+# Increase it when the manifest's structure changes
+manifest_version = 4
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _stat_signature(path: Path):
+    """
+    Returns the (size, mtime_ns) signature of the file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class ScanManifest(object):
+    """
+    The persistent scan manifest of a data folder.
+
+    Attributes:
+        folder (Path): The scanned folder.
+        path (Path): The path of the manifest file.
+        dirs (dict): The relative directory -> dict(mtime, subdirs, names).
+        records (dict): The posix path relative to the folder -> the found record.
+        signatures (dict): The relative path -> the signature of the record's files.
+        contents (dict): The relative path -> (signature, content fingerprint) of the record.
+    """
+
+    folder = None
+    path = None
+    dirs = {}
+    records = {}
+    signatures = {}
+    contents = {}
+
+    def __init__(self, folder: Path, path: Path = None):
+        self.folder = Path(folder)
+
+        if path is None:
+            unique = hashlib.md5(self.folder.as_posix().encode()).hexdigest()
+            path = cache_path.joinpath(f'scan_manifest-{unique}')
+        self.path = Path(path)
+
+        self.dirs = {}
+        self.records = {}
+        self.signatures = {}
+        self.contents = {}
+        self.load()
+
+    def load(self):
+        """
+        Loads the manifest from the disk, keeps empty if not exists or outdated.
+        """
+        if not self.path.is_file():
+            logger.debug(f'No scan manifest found: {self.path}')
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                dct = pickle.load(f)
+            assert dct['version'] == manifest_version, 'Outdated manifest'
+            assert dct['folder'] == self.folder.as_posix(), 'Different folder'
+            self.dirs = dct['dirs']
+            self.records = dct['records']
+            self.signatures = dct['signatures']
+            self.contents = dct['contents']
+            logger.debug(
+                f'Loaded scan manifest: {self.path}, {len(self.dirs)} dirs, {len(self.records)} records')
+        except Exception as err:
+            logger.warning(f'Ignored invalid scan manifest: {self.path}, {err}')
+            self.dirs = {}
+            self.records = {}
+            self.signatures = {}
+            self.contents = {}
+
+    def save(self):
+        """
+        Saves the manifest to the disk.
+        The file is written into a temporary file and renamed, so a crash never leaves a broken manifest.
+        """
+        dct = dict(
+            version=manifest_version,
+            folder=self.folder.as_posix(),
+            dirs=self.dirs,
+            records=self.records,
+            signatures=self.signatures,
+            contents=self.contents,
+        )
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(dct, f)
+        os.replace(tmp, self.path)
+        logger.debug(f'Saved scan manifest: {self.path}')
+
+    def _list_dir(self, rel: str):
+        """
+        Lists the directory, reusing the recorded listing if its mtime is not changed.
+
+        Args:
+            rel (str): The posix path relative to the folder, '' refers the folder itself.
+
+        Returns:
+            dict: The dict(mtime, subdirs, names), or None if the directory is gone.
+            bool: Whether the directory is changed.
+        """
+        path = self.folder.joinpath(rel)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, True
+
+        old = self.dirs.get(rel)
+        if old is not None and old['mtime'] == mtime:
+            return old, False
+
+        try:
+            subdirs, names = scan_dir(path)
+        except OSError as err:
+            logger.warning(f'Failed listing directory: {path}, {err}')
+            return None, True
+
+        return dict(mtime=mtime, subdirs=subdirs, names=names), True
+
+    def rescan(self, parse: Callable, top_level: set = None, max_workers: int = default_max_workers):
+        """
+        Re-scan the folder concurrently, and update the manifest.
+
+        Args:
+            parse (Callable): The parser of the path, parse(path, folder) -> record or None.
+                              The record's 'evt_path' is also watched if it has one.
+            top_level (set, optional): Only walk into the top-level directories in it, defaults to walk into all of them.
+            max_workers (int, optional): The concurrency of the walking.
+
+        Returns:
+            dict: The delta of dict(added=[...], removed=[...], modified=[...]) records.
+        """
+        dirs = {}
+        records = {}
+        signatures = {}
+        changed_dirs = []
+
+        def _scan(folder: str):
+            rel = Path(folder).relative_to(self.folder).as_posix()
+            rel = '' if rel == '.' else rel
+
+            listing, changed = self._list_dir(rel)
+            if listing is None:
+                raise FileNotFoundError(f'Directory is gone: {folder}')
+
+            _records = {}
+            _signatures = {}
+            for name in listing['names']:
+                path = self.folder.joinpath(rel, name)
+                # The relative key, the folder is not repeated in every key of the manifest
+                key = posixpath.join(rel, name)
+
+                # Reuse the record of the unchanged directory,
+                # but the files are stat-ed anyway, since writing into the file does not touch its directory.
+                if not changed and key in self.records:
+                    record = self.records[key]
+                elif not changed:
+                    # Known not to be a record
+                    continue
+                else:
+                    record = parse(path, self.folder)
+
+                if record is None:
+                    continue
+
+                evt_path = record.get('evt_path')
+                _signatures[key] = (
+                    _stat_signature(path),
+                    None if evt_path is None else _stat_signature(evt_path))
+                _records[key] = record
+
+            # The dict.update and list.append are atomic
+            dirs.update({rel: listing})
+            records.update(_records)
+            signatures.update(_signatures)
+            if changed:
+                changed_dirs.append(rel)
+            return listing['subdirs'], listing['names']
+
+        for _ in walk_roots([(self.folder, max_workers)], top_level=top_level, scan=_scan):
+            pass
+
+        # --------------------
+        # Compute the delta
+        added = [records[k] for k in records if k not in self.records]
+        removed = [self.records[k] for k in self.records if k not in records]
+        modified = [
+            records[k] for k in records
+            if k in self.signatures and signatures[k] != self.signatures[k]]
+
+        self.dirs = dirs
+        self.records = records
+        self.signatures = signatures
+
+        logger.info(
+            f'Re-scanned {self.folder}: {len(changed_dirs)} | {len(dirs)} dirs changed, added {len(added)}, removed {len(removed)}, modified {len(modified)}')
+
+        return dict(added=added, removed=removed, modified=modified)
+
+    def update_contents(self, max_workers: int = default_max_workers) -> dict:
+        """
+        Computes the content fingerprints of the records,
+        only the records whose files are changed since the last time are read.
+
+        Args:
+            max_workers (int, optional): The number of the reading threads.
+
+        Returns:
+            dict: The path string -> the content fingerprint, None if the file is not readable.
+        """
+        todo = [
+            k for k in self.records
+            if k not in self.contents or self.contents[k][0] != self.signatures.get(k)]
+
+        def _compute(key):
+            record = self.records[key]
+            try:
+                return content_fingerprint(record['path'], record.get('evt_path'))
+            except OSError as err:
+                logger.warning(f'Failed fingerprinting: {key}, {err}')
+                return None
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            for key, content in zip(todo, executor.map(_compute, todo)):
+                self.contents[key] = (self.signatures.get(key), content)
+
+        self.contents = {
+            k: v for k, v in self.contents.items() if k in self.records}
+
+        logger.debug(
+            f'Fingerprinted {self.folder}: {len(todo)} | {len(self.records)} records')
+
+        return {k: v[1] for k, v in self.contents.items()}
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,280 @@
+"""
+File: scanner_daemon.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The resident scanner of the data folders.
+
+    The folders are re-scanned incrementally with the scan manifest at every interval,
+    only the new or changed files, and the files never checked, are checked,
+    and the results are written into the catalog.
+    The deltas of the catalog are pushed to the subscribers over the local connection,
+    so the open windows update their tables without reloading.
+    The connection is authenticated both ways with the random key of the install,
+    it is in the file only readable by the user, so the other users can not pose as the daemon.
+
+    The scan manifest is saved after the results of the changed files are in the catalog,
+    so the changes are found again if the daemon stops before.
+    The files are checked in the pool of worker processes, see check_pool.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import time
+import queue
+import secrets
+import threading
+import pandas as pd
+
+from pathlib import Path
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+from . import logger, cache_path
+from .find_files import scan_incremental, as_categoricals
+from .check_pool import parallel_format_check
+from .catalog import Catalog
+
+# The local address of the scanner daemon
+default_address = ('localhost', 6060)
+
+# The file of the authentication key of the install
+default_authkey_path = cache_path.joinpath('scanner-daemon.key')
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def load_authkey(path: Path = default_authkey_path) -> bytes:
+    """
+    Loads the authentication key of the install,
+    the random key is generated into the file only readable by the user if it does not exist.
+
+    Args:
+        path (Path, optional): The file of the key, defaults to the one in the cache folder.
+
+    Returns:
+        bytes: The key.
+    """
+    path = Path(path)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except FileExistsError:
+        # Generated by the other process
+        time.sleep(0.1)
+        return path.read_bytes()
+
+    key = secrets.token_bytes(32)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    logger.info(f'Generated scanner daemon key: {path}')
+    return key
+
+
+class ScannerDaemon(object):
+    """
+    The resident scanner, it checks the changed files and pushes the deltas.
+
+    Attributes:
+        folders (list): The data folders and their concurrency of walking, [(folder, max_workers)].
+        interval (float): The seconds between the scans.
+        address (tuple): The local address the subscribers connect to.
+        n_workers (int): The number of the format check processes.
+        timeout (float): The seconds allowed for checking one file.
+        kwargs (dict): The keyword arguments of the format_check, like header_only.
+    """
+
+    def __init__(self, folders: list, interval: float = 60, address: tuple = default_address, authkey: bytes = None, n_workers: int = None, timeout: float = 600, **kwargs):
+        self.folders = folders
+        self.interval = interval
+        self.address = address
+        self.authkey = authkey or load_authkey()
+        self.n_workers = n_workers
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.clients = []
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _accept(self, listener: Listener):
+        while not self.stop.is_set():
+            try:
+                conn = listener.accept()
+            except Exception as err:
+                logger.warning(f'Failed accepting subscriber: {err}')
+                continue
+            with self._lock:
+                self.clients.append(conn)
+            logger.info(f'Accepted subscriber: {listener.last_accepted}')
+
+    def broadcast(self, message: dict):
+        """
+        Sends the message to all the subscribers, the closed ones are dropped.
+        """
+        with self._lock:
+            alive = []
+            for conn in self.clients:
+                try:
+                    conn.send(message)
+                    alive.append(conn)
+                except (OSError, EOFError):
+                    conn.close()
+            self.clients = alive
+        logger.debug(f'Broadcast delta to {len(alive)} subscribers')
+
+    def scan_once(self, catalog: Catalog) -> dict:
+        """
+        Scans the folders, checks the changed files and writes the results into the catalog.
+
+        Returns:
+            dict: The delta, dict(upserted=pd.DataFrame of the changed files in the catalog, removed=[paths]).
+        """
+        dfs = []
+        manifests = []
+        changed = set()
+        removed = set()
+        for folder, max_workers in self.folders:
+            manifest, found_files, delta = scan_incremental(folder, max_workers=max_workers)
+            manifests.append(manifest)
+            dfs.append(found_files)
+            changed.update(e['path'] for e in delta['added'] + delta['modified'])
+            removed.update(e['path'] for e in delta['removed'])
+
+        found_files = as_categoricals(pd.concat(dfs, axis=0))
+        catalog.sync_files(found_files)
+        catalog.index_channels()
+        catalog.index_events()
+
+        # The files never checked are checked too, like the ones found when the daemon is down
+        unchecked = {e for e, in catalog.conn.execute(
+            'SELECT path FROM files WHERE status IS NULL')}
+        todo = found_files[found_files['path'].isin(changed | unchecked)]
+
+        # The copies share the output of their canonical copy
+        canonicals = {}
+        for _, row in todo.iterrows():
+            canonicals.setdefault(row.get('canonical', row['path']), row)
+        files = list(canonicals.values())
+        outputs = parallel_format_check(
+            files, n_workers=self.n_workers, timeout=self.timeout, **self.kwargs)
+        outputs = {k: e for k, e in zip(canonicals, outputs)}
+        for _, row in todo.iterrows():
+            output = outputs[row.get('canonical', row['path'])]
+            catalog.put_result(dict(output, path=row['path']))
+
+        # The changes are handled, they are not found again
+        for manifest in manifests:
+            manifest.save()
+
+        df = catalog.query()
+        upserted = df[df['path'].isin(todo['path'])]
+        logger.info(
+            f'Scanned {len(found_files)} files, checked {len(outputs)} | {len(todo)} files, removed {len(removed)} files')
+        return dict(upserted=upserted, removed=sorted(removed))
+
+    def run(self):
+        """
+        Scans the folders at every interval, until stopped.
+        """
+        listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._accept, args=(listener,),
+                         daemon=True, name='scanner-accept').start()
+        logger.info(f'Started scanner daemon: {self.address}, every {self.interval} seconds')
+
+        catalog = Catalog()
+        try:
+            while not self.stop.is_set():
+                tic = time.time()
+                try:
+                    delta = self.scan_once(catalog)
+                    if len(delta['upserted']) or delta['removed']:
+                        self.broadcast(delta)
+                except Exception as err:
+                    logger.exception(f'Failed scanning: {err}')
+                self.stop.wait(max(self.interval - (time.time() - tic), 0))
+        finally:
+            catalog.close()
+            listener.close()
+            logger.info('Stopped scanner daemon')
+
+
+class DeltaSubscriber(object):
+    """
+    The subscriber of the scanner daemon's deltas.
+    It connects in the background thread and retries if the daemon is not running,
+    the received deltas are put into the queue, the GUI thread takes them with the poll.
+
+    Attributes:
+        deltas (queue.Queue): The received deltas.
+    """
+
+    def __init__(self, address: tuple = default_address, authkey: bytes = None, retry: float = 10):
+        self.address = address
+        self.authkey = authkey or load_authkey()
+        self.retry = retry
+        self.deltas = queue.Queue()
+
+    def _receive(self):
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except OSError:
+                time.sleep(self.retry)
+                continue
+            except AuthenticationError:
+                # Not the daemon of the install, the deltas are not received from it
+                logger.warning(f'Failed authenticating scanner daemon: {self.address}')
+                time.sleep(self.retry)
+                continue
+
+            logger.info(f'Subscribed scanner daemon: {self.address}')
+            try:
+                while True:
+                    self.deltas.put(conn.recv())
+            except (OSError, EOFError):
+                logger.warning(f'Lost scanner daemon: {self.address}')
+            finally:
+                conn.close()
+
+    def start(self):
+        threading.Thread(target=self._receive, daemon=True, name='delta-subscriber').start()
+        return self
+
+    def poll(self) -> list:
+        """
+        Returns the deltas received since the last poll, without blocking.
+        """
+        output = []
+        while True:
+            try:
+                output.append(self.deltas.get_nowait())
+            except queue.Empty:
+                return output
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
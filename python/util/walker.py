@@ -0,0 +1,172 @@
+"""
+File: walker.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    Concurrent directory walker built on os.scandir and thread pools.
+
+    Every data root has its own thread pool,
+    so the slow network root and the local disk root are walked with different parallelism.
+    The top-level directories can be pruned before walking into them.
+
+    It is shared by util.find_files and backend/data/search_data.py.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import queue
+import threading
+
+from pathlib import Path
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger
+
+# The default concurrency of every root
+default_max_workers = 8
+
+# The default number of the listed folders waiting for the consumer
+default_queue_size = 1024
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def scan_dir(folder: str):
+    """
+    Lists the folder in the same way as os.walk,
+    but the symlinks to directories are skipped, they are neither walked into nor listed as files.
+
+    Args:
+        folder (str): The folder to list.
+
+    Returns:
+        list: The sub-directories to walk into.
+        list: The names of the files.
+    """
+    subdirs = []
+    names = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if not is_dir:
+                names.append(entry.name)
+            elif not entry.is_symlink():
+                subdirs.append(entry.name)
+    return subdirs, names
+
+
+def _parse_root(root, max_workers: int):
+    """
+    Parses the root into (Path, max_workers).
+    The root is either the folder or the (folder, max_workers) pair.
+    """
+    if isinstance(root, (tuple, list)):
+        folder, n = root
+        return Path(folder), int(n)
+    return Path(root), max_workers
+
+
+def walk_roots(roots: list, top_level: set = None, scan: Callable = scan_dir, max_workers: int = default_max_workers, queue_size: int = default_queue_size):
+    """
+    Walks the roots concurrently, and yields the folders as soon as they are listed.
+
+    Args:
+        roots (list): The roots, every element is the folder or the (folder, max_workers) pair.
+        top_level (set, optional): Only walk into the top-level directories in it, defaults to walk into all of them.
+        scan (Callable, optional): The lister of the folder, scan(folder) -> (subdirs, names), defaults to scan_dir.
+        max_workers (int, optional): The concurrency of the root without its own max_workers.
+        queue_size (int, optional): The number of the listed folders waiting for the consumer,
+                                    the walkers wait when it is full, so the slow consumer does not pile up the listings.
+
+    Yields:
+        tuple: (root, folder, subdirs, names), the folder is str.
+               The order is not the same as os.walk, the caller should sort if required.
+    """
+    roots = [_parse_root(e, max_workers) for e in roots]
+
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def _scan(executor, root, folder, depth):
+        subdirs = []
+        names = []
+        try:
+            if stop.is_set():
+                return
+            subdirs, names = scan(folder)
+        except OSError as err:
+            # The same as os.walk, the unreadable folder is ignored
+            logger.warning(f'Failed listing folder: {folder}, {err}')
+        except Exception as err:
+            logger.error(f'Failed scanning folder: {folder}, {err}')
+        finally:
+            if depth == 0 and top_level is not None:
+                subdirs = [e for e in subdirs if e in top_level]
+
+            # Put the folder before submitting its sub-directories,
+            # so the pending counter never hits zero before the sub-directories are done.
+            # The put gives up when the walking is stopped, since nobody gets the results then.
+            while not stop.is_set():
+                try:
+                    results.put((root, folder, subdirs, names, len(subdirs)), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+            for e in subdirs:
+                try:
+                    executor.submit(
+                        _scan, executor, root, os.path.join(folder, e), depth + 1)
+                except RuntimeError:
+                    # The executor is shut down
+                    break
+
+    executors = []
+    pending = 0
+    try:
+        for root, n in roots:
+            executor = ThreadPoolExecutor(
+                max_workers=n, thread_name_prefix=f'walk-{root.name}')
+            executors.append(executor)
+            executor.submit(_scan, executor, root, root.as_posix(), 0)
+            pending += 1
+            logger.debug(f'Walking root: {root} with {n} workers')
+
+        while pending > 0:
+            root, folder, subdirs, names, n = results.get()
+            pending += n - 1
+            yield root, folder, subdirs, names
+
+    finally:
+        # The generator is closed or exhausted
+        stop.set()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
@@ -0,0 +1,484 @@
+"""
+File: work_queue.py
+Author: Chuncheng Zhang
+Date: 2026-10-18
+Copyright & Email: chuncheng.zhang@ia.ac.cn
+
+Purpose:
+    The work queue of the format checks on the shared filesystem.
+
+    The coordinator puts the files to check into the queue folder,
+    the workers on any machine mounting the folder claim them with the lease files,
+    and write the check results back, the coordinator collects and merges them.
+    The worker checks the item in its child process, and refreshes its lease while waiting,
+    so the lease of a dead worker expires, and its item is claimed by another worker,
+    and the child that hangs or crashes on the file is killed or replaced, the item is failed.
+    No broker is required, the files are the only communication.
+
+    The heartbeats in the lease files are the times of the shared filesystem,
+    the mtime of the file just written by the worker,
+    so the clocks of the machines do not need to agree.
+
+    The layout of the queue folder:
+    - todo/<item>.pkl: The work items, the file to check and the keyword arguments of the format_check.
+    - leases/<item>.lease: The leases of the claimed items, the content is the worker, the attempts and the heartbeat.
+    - leases/<item>.pkl: The claimed items, they are moved from the todo folder.
+    - results/<item>.pkl: The check results of the finished items.
+    - clock/<worker>: The files written by the workers to read the time of the shared filesystem.
+    - closed: The coordinator has collected all the results, the workers exit.
+
+Functions:
+    1. Requirements and constants
+    2. Function and class
+    3. Play ground
+    4. Pending
+    5. Pending
+"""
+
+
+# %% ---- 2026-10-18 ------------------------
+# Requirements and constants
+import os
+import time
+import uuid
+import shutil
+import pickle
+import socket
+import multiprocessing as mp
+
+from pathlib import Path
+from typing import Callable
+from multiprocessing.connection import wait
+from tqdm.auto import tqdm
+
+from . import logger
+from .check_pool import failed_output, CheckWorker
+
+# The seconds a lease lasts without being refreshed
+default_lease = 60
+
+# The item is failed after the attempts, its workers died or timed out
+default_max_attempts = 3
+
+# The seconds waited before reading back the taken over lease, the concurrent takeovers land in it
+default_settle = 0.5
+
+
+# %% ---- 2026-10-18 ------------------------
+# Function and class
+def _write_atomic(path: Path, obj):
+    """
+    Pickles the obj into the temporary file, and renames it to the path.
+    """
+    tmp = path.with_name(f'tmp-{uuid.uuid4().hex[:8]}-{path.name}')
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _write_text_atomic(path: Path, text: str):
+    """
+    Writes the text into the temporary file, and replaces the path with it.
+    """
+    tmp = path.with_name(f'tmp-{uuid.uuid4().hex[:8]}-{path.name}')
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _parse_lease(text: str) -> tuple:
+    """
+    Parses the content of the lease file.
+
+    Returns:
+        tuple: (worker, attempts, heartbeat).
+    """
+    worker, attempts, heartbeat = text.split()
+    return worker, int(attempts), float(heartbeat)
+
+
+class WorkQueue(object):
+    """
+    The work queue in the folder of the shared filesystem.
+
+    Attributes:
+        folder (Path): The queue folder.
+        lease (float): The seconds a lease lasts without being refreshed.
+        settle (float): The seconds waited before reading back the taken over lease.
+    """
+
+    def __init__(self, folder: Path, lease: float = default_lease, settle: float = default_settle):
+        self.folder = Path(folder)
+        self.lease = lease
+        self.settle = settle
+        self.todo = self.folder.joinpath('todo')
+        self.leases = self.folder.joinpath('leases')
+        self.results = self.folder.joinpath('results')
+        self.clock = self.folder.joinpath('clock')
+
+    def reset(self):
+        """
+        Clears the queue folder for the new run.
+        """
+        for p in [self.todo, self.leases, self.results, self.clock]:
+            shutil.rmtree(p, ignore_errors=True)
+            p.mkdir(parents=True, exist_ok=True)
+        self.folder.joinpath('closed').unlink(missing_ok=True)
+
+    def put(self, items: list):
+        """
+        Puts the items into the queue, the item's id is its index.
+        """
+        for j, item in enumerate(items):
+            _write_atomic(self.todo.joinpath(f'{j:08d}.pkl'), item)
+        logger.info(f'Put {len(items)} items into the work queue: {self.folder}')
+
+    def close(self):
+        self.folder.joinpath('closed').touch()
+
+    def is_closed(self) -> bool:
+        return self.folder.joinpath('closed').is_file()
+
+    def now(self, worker: str) -> float:
+        """
+        Returns the time of the shared filesystem, the mtime of the clock file just written by the worker.
+        """
+        path = self.clock.joinpath(worker)
+        with open(path, 'w') as f:
+            f.write(worker)
+        return os.stat(path).st_mtime
+
+    def pending(self) -> list:
+        """
+        Returns the ids of the unclaimed items, the claimed ones are moved out of the todo folder.
+        """
+        try:
+            names = sorted(os.listdir(self.todo))
+        except FileNotFoundError:
+            return []
+        return [n[:-4] for n in names if n.endswith('.pkl') and not n.startswith('tmp-')]
+
+    def leased(self) -> list:
+        """
+        Returns the ids of the claimed items.
+        """
+        try:
+            names = sorted(os.listdir(self.leases))
+        except FileNotFoundError:
+            return []
+        return [n[:-6] for n in names if n.endswith('.lease') and not n.startswith('tmp-')]
+
+    def claim(self, item_id: str, worker: str):
+        """
+        Claims the unclaimed item, the lease file is created exclusively,
+        and the item is moved into the leases folder.
+
+        Returns:
+            int | None: The attempts of the item including this one, or None if the item is claimed by others.
+        """
+        lease = self.leases.joinpath(f'{item_id}.lease')
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        os.write(fd, f'{worker} 1 {self.now(worker)}'.encode())
+        os.close(fd)
+
+        try:
+            os.rename(self.todo.joinpath(f'{item_id}.pkl'), self.leases.joinpath(f'{item_id}.pkl'))
+        except FileNotFoundError:
+            # The item is finished since listed
+            lease.unlink(missing_ok=True)
+            return None
+        return 1
+
+    def take_over(self, item_id: str, worker: str):
+        """
+        Takes over the expired lease of the item.
+        The lease is replaced atomically and read back after settled,
+        only the last of the concurrent takeovers reads back its own lease.
+
+        Returns:
+            int | None: The attempts of the item including this one, or None if the lease is alive or taken by others.
+        """
+        lease = self.leases.joinpath(f'{item_id}.lease')
+        try:
+            _, attempts, heartbeat = _parse_lease(lease.read_text())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # The lease is created but not written yet, or corrupted
+            attempts, heartbeat = 1, os.stat(lease).st_mtime
+
+        now = self.now(worker)
+        if now - heartbeat < self.lease:
+            return None
+
+        token = f'{worker} {attempts + 1} {now}'
+        _write_text_atomic(lease, token)
+        time.sleep(self.settle)
+        try:
+            if lease.read_text() != token:
+                return None
+        except FileNotFoundError:
+            return None
+
+        # The expired worker may be killed before the item is moved
+        try:
+            os.rename(self.todo.joinpath(f'{item_id}.pkl'), self.leases.joinpath(f'{item_id}.pkl'))
+        except FileNotFoundError:
+            pass
+
+        logger.warning(f'Took over expired lease: {item_id}, after {attempts} attempts')
+        return attempts + 1
+
+    def release(self, item_id: str):
+        """
+        Puts the claimed item back into the todo folder.
+        """
+        try:
+            os.rename(self.leases.joinpath(f'{item_id}.pkl'), self.todo.joinpath(f'{item_id}.pkl'))
+        except FileNotFoundError:
+            pass
+        self.leases.joinpath(f'{item_id}.lease').unlink(missing_ok=True)
+
+    def refresh(self, item_id: str, worker: str) -> bool:
+        """
+        Refreshes the heartbeat of the worker's lease.
+
+        Returns:
+            bool: Whether the lease is still the worker's, it is taken over by others if not.
+        """
+        lease = self.leases.joinpath(f'{item_id}.lease')
+        try:
+            owner, attempts, _ = _parse_lease(lease.read_text())
+        except (OSError, ValueError):
+            return False
+        if owner != worker:
+            return False
+        _write_text_atomic(lease, f'{worker} {attempts} {self.now(worker)}')
+        return True
+
+    def load(self, item_id: str):
+        with open(self.leases.joinpath(f'{item_id}.pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def finish(self, item_id: str, output: dict):
+        """
+        Writes the result of the item and removes its lease.
+        """
+        _write_atomic(self.results.joinpath(f'{item_id}.pkl'), output)
+        self.leases.joinpath(f'{item_id}.pkl').unlink(missing_ok=True)
+        self.leases.joinpath(f'{item_id}.lease').unlink(missing_ok=True)
+
+    def collect(self, collected: set) -> list:
+        """
+        Collects the new results, their items and results are removed from the queue.
+
+        Args:
+            collected (set): The ids of the collected items, it is updated.
+
+        Returns:
+            list: The (index, output) of the new results.
+        """
+        output = []
+        for name in sorted(os.listdir(self.results)):
+            if not name.endswith('.pkl') or name.startswith('tmp-'):
+                continue
+            item_id = name[:-4]
+            path = self.results.joinpath(name)
+            if item_id not in collected:
+                with open(path, 'rb') as f:
+                    output.append((int(item_id), pickle.load(f)))
+                collected.add(item_id)
+                self.todo.joinpath(name).unlink(missing_ok=True)
+                self.leases.joinpath(name).unlink(missing_ok=True)
+            path.unlink(missing_ok=True)
+        return output
+
+
+def run_worker(folder: Path, lease: float = default_lease, timeout: float = 600, max_attempts: int = default_max_attempts, poll: float = 1.0, max_tasks: int = 100):
+    """
+    The loop of the worker, it claims the items until the queue is closed.
+    The items are checked in the child process,
+    the child is killed if it times out, and replaced if it dies, the item is failed in both cases.
+
+    Args:
+        folder (Path): The queue folder.
+        lease (float, optional): The seconds a lease lasts without being refreshed, defaults to 60.
+        timeout (float, optional): The seconds allowed for checking one item, defaults to 600.
+        max_attempts (int, optional): The item is failed after the attempts, defaults to 3.
+        poll (float, optional): The seconds between the polls of the idle worker, defaults to 1.0.
+        max_tasks (int, optional): The child is replaced after checking max_tasks items to release its memory, defaults to 100.
+    """
+    queue = WorkQueue(folder, lease)
+    worker = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    ctx = mp.get_context('spawn')
+    checker = None
+    logger.info(f'Started work queue worker: {worker}, {folder}')
+
+    def _claim():
+        for item_id in queue.pending():
+            attempts = queue.claim(item_id, worker)
+            if attempts is not None:
+                return item_id, attempts
+        # The items of the dead workers
+        for item_id in queue.leased():
+            attempts = queue.take_over(item_id, worker)
+            if attempts is not None:
+                return item_id, attempts
+        return None
+
+    n = 0
+    try:
+        while not queue.is_closed():
+            claimed = _claim()
+            if claimed is None:
+                time.sleep(poll)
+                continue
+
+            item_id, attempts = claimed
+            try:
+                item = queue.load(item_id)
+            except FileNotFoundError:
+                # The item is finished by another worker since listed
+                queue.leases.joinpath(f'{item_id}.lease').unlink(missing_ok=True)
+                continue
+
+            file, kwargs = item['file'], item['kwargs']
+            if attempts > max_attempts:
+                queue.finish(item_id, failed_output(
+                    file, f'Failed after {attempts - 1} attempts, the workers died or timed out'))
+                continue
+
+            if checker is None or checker.kwargs != kwargs or not checker.process.is_alive():
+                if checker is not None:
+                    checker.close(kill=not checker.process.is_alive())
+                checker = CheckWorker(ctx, kwargs)
+
+            # Wait for the child, and refresh the lease meanwhile
+            checker.submit(0, file)
+            output, lost = None, False
+            while output is None:
+                ready = wait([checker.conn, checker.process.sentinel], timeout=lease / 3)
+                if checker.conn in ready:
+                    try:
+                        _, output = checker.conn.recv()
+                        checker.done()
+                        continue
+                    except (EOFError, OSError):
+                        pass
+
+                if checker.conn in ready or checker.process.sentinel in ready:
+                    checker.process.join()
+                    output = failed_output(
+                        file, f'Worker died with exitcode {checker.process.exitcode}')
+                    logger.error(f'Format check worker died: {file["path"]}')
+                elif time.time() - checker.start > timeout:
+                    output = failed_output(file, f'Timeout after {timeout} seconds')
+                    logger.error(f'Format check timeout: {file["path"]}')
+                elif not queue.refresh(item_id, worker):
+                    logger.warning(f'Lost lease: {item_id}, it is taken over by others')
+                    lost = True
+                else:
+                    continue
+
+                checker.close(kill=True)
+                checker = None
+                if lost:
+                    break
+
+            if lost:
+                continue
+
+            if checker is not None and checker.n_tasks >= max_tasks:
+                checker.close()
+                checker = None
+
+            queue.finish(item_id, output)
+            n += 1
+    finally:
+        if checker is not None:
+            checker.close(kill=checker.task is not None)
+
+    logger.info(f'Stopped work queue worker: {worker}, checked {n} items')
+
+
+def coordinate(folder: Path, files: list, n_workers: int = 0, lease: float = default_lease, timeout: float = 600, callback: Callable = None, poll: float = 1.0, **kwargs) -> list:
+    """
+    Puts the files into the work queue, and collects their check results.
+    The workers are started on the other machines with the same folder,
+    and n_workers local worker processes are started and kept alive.
+
+    Args:
+        folder (Path): The queue folder on the shared filesystem.
+        files (list): The files to check, every element is the row of the found files.
+        n_workers (int, optional): The number of the local worker processes, defaults to 0.
+        lease (float, optional): The seconds a lease lasts without being refreshed, defaults to 60.
+        timeout (float, optional): The seconds allowed for checking one file, defaults to 600.
+        callback (Callable, optional): It is called as callback(i, output) as soon as the i-th file's result is collected.
+        poll (float, optional): The seconds between the collections, defaults to 1.0.
+        **kwargs: The keyword arguments of the format_check, like header_only.
+
+    Returns:
+        list: The check results in the same order as the files.
+    """
+    files = list(files)
+    outputs = [None] * len(files)
+    if len(files) == 0:
+        return outputs
+
+    queue = WorkQueue(folder, lease)
+    queue.reset()
+    queue.put([dict(file=file, kwargs=kwargs) for file in files])
+
+    ctx = mp.get_context('spawn')
+
+    def _start():
+        # Not daemonic, the worker starts its child process to check
+        p = ctx.Process(target=run_worker, args=(folder, lease, timeout))
+        p.start()
+        return p
+
+    workers = [_start() for _ in range(n_workers)]
+
+    collected = set()
+    bar = tqdm(total=len(files), desc='Format checking (queue)')
+    try:
+        while len(collected) < len(files):
+            for i, output in queue.collect(collected):
+                outputs[i] = output
+                if callback is not None:
+                    callback(i, output)
+                bar.update()
+
+            # Keep the local workers alive
+            for k, p in enumerate(workers):
+                if not p.is_alive():
+                    logger.warning(f'Restarted local worker, exitcode {p.exitcode}')
+                    workers[k] = _start()
+
+            if len(collected) < len(files):
+                time.sleep(poll)
+    finally:
+        bar.close()
+        queue.close()
+        for p in workers:
+            p.join(timeout=poll * 5)
+            if p.is_alive():
+                p.kill()
+
+    logger.info(f'Collected {len(collected)} results from the work queue: {folder}')
+    return outputs
+
+
+# %% ---- 2026-10-18 ------------------------
+# Play ground
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending
+
+
+# %% ---- 2026-10-18 ------------------------
+# Pending